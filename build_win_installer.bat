@@ -1 +1,4 @@
-pyinstaller --onefile --windowed --icon=resources\images\app_icon.ico --name=shortcircuit src\main.py
+pyinstaller --onefile --windowed --icon=resources\images\app_icon.ico --name=shortcircuit ^
+    --add-data "resources\database\universe.bin;database" ^
+    --add-data "resources\database\landmarks.bin;database" ^
+    src\main.py
@@ -1,7 +1,72 @@
 # db_create.py
 
+import csv
+import hashlib
 import os
 import sqlite3
+import sys
+from shortcircuit.model.evedb import EveDb
+from shortcircuit.model.landmarks import Landmarks
+from shortcircuit.model.universe import Universe
+
+
+def write_binary(db_dir):
+    """
+    Generates universe.bin (memory-mapped by the app at startup) and landmarks.bin
+    (landmark distance tables used by weighted routing) from system_jumps.csv and system_description.csv
+    :param db_dir: database resource directory
+    :return:
+    """
+    with open(os.path.join(db_dir, "system_jumps.csv"), "r") as f_in:
+        gates = [[int(rows[0]), int(rows[1])] for rows in csv.reader(f_in, delimiter=';')]
+    with open(os.path.join(db_dir, "system_description.csv"), "r") as f_in:
+        system_desc = {
+            int(rows[0]): [rows[1], rows[2], float(rows[3])]
+            for rows in csv.reader(f_in, delimiter=';')
+        }
+
+    eve_db = EveDb(gates, system_desc, {})
+    Universe.write(os.path.join(db_dir, "universe.bin"), eve_db)
+    landmarks = Landmarks.compute(eve_db.gate_graph)
+    landmarks.save(os.path.join(db_dir, "landmarks.bin"), eve_db.gate_graph)
+
+
+def sde_hash(eve_db_file):
+    """
+    :return: SHA-1 of the SDE database contents (read in chunks)
+    """
+    sha1 = hashlib.sha1()
+    with open(eve_db_file, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_system_class(wormhole_class, security):
+    """
+    :param wormhole_class: wormholeClassID of the region (or else of the system), None if missing
+    :param security: system security
+    :return: wormhole class or k-space class (HS, LS, NS)
+    """
+    if wormhole_class is None:
+        return "Unknown"
+    if wormhole_class in [1, 2, 3, 4, 5, 6, 12, 13, 14, 15, 16, 17, 18]:
+        return "C{}".format(wormhole_class)
+    if 0.45 <= security:
+        return "HS"
+    elif 0 <= security < 0.45:
+        return "LS"
+    else:
+        return "NS"
+
+
+def format_security(security):
+    if security < 0:
+        return "{:.2f}".format(security)
+    elif 0 <= security <= 0.1:
+        return "0.1"
+    else:
+        return "{:.1f}".format(security)
 
 
 def main():
@@ -9,71 +74,67 @@ def main():
     Generates the following files:
         - system_description.csv
         - system_jumps.csv
+        - universe.bin
+        - landmarks.bin
     from the SDE database (https://developers.eveonline.com/resource/resources)
     Place "universeDataDx.db" in the database resource directory for this script to run
+    Use "--binary" to only regenerate universe.bin and landmarks.bin from the existing CSV files
+    Use "--incremental" to skip the extraction if the SDE did not change since the last run
     :return:
     """
     db_dir = os.path.join("..", "resources", "database")
+    if "--binary" in sys.argv[1:]:
+        write_binary(db_dir)
+        return
+
     eve_db_file = os.path.join(db_dir, "universeDataDx.db")
+    sde_hash_file = os.path.join(db_dir, "universeDataDx.sha1")
     system_jumps_file = os.path.join(db_dir, "system_jumps.csv")
     system_description_file = os.path.join(db_dir, "system_description.csv")
 
-    # read Eve SQL databse
+    current_hash = sde_hash(eve_db_file)
+    if "--incremental" in sys.argv[1:]:
+        try:
+            with open(sde_hash_file, "r") as f_in:
+                previous_hash = f_in.read().strip()
+        except IOError:
+            previous_hash = None
+        if previous_hash == current_hash:
+            print "SDE unchanged, nothing to do"
+            return
+
+    # read Eve SQL databse (rows are streamed from the cursors straight into the files)
     with sqlite3.connect(eve_db_file) as sql_con:
         cursor = sql_con.cursor()
 
         # write solar system jumps file (gate connections)
         result = cursor.execute('SELECT fromSolarSystemID, toSolarSystemID FROM mapSolarSystemJumps')
         with open(system_jumps_file, "w") as f_out:
-            for row in result.fetchall():
+            for row in result:
                 f_out.write("{};{}\n".format(row[0], row[1]))
 
         # write solar system description file (id, name, security class, security value)
-        result = cursor.execute('SELECT regionID, solarSystemID, solarSystemName, security FROM mapSolarSystems')
+        # the wormhole class of the region takes precedence over the one of the system
+        result = cursor.execute(
+            'SELECT s.solarSystemID, s.solarSystemName, s.security, '
+            'COALESCE(r.wormholeClassID, c.wormholeClassID) '
+            'FROM mapSolarSystems s '
+            'LEFT JOIN mapLocationWormholeClasses r ON r.locationID = s.regionID '
+            'LEFT JOIN mapLocationWormholeClasses c ON c.locationID = s.solarSystemID'
+        )
         with open(system_description_file, "w") as f_out:
-            for row in result.fetchall():
-                region_id = row[0]
-                system_id = row[1]
-                system_name = row[2]
-                security = float(row[3])
-
-                # try and compute wormhole class or k-space class (HS, LS, NS)
-                query = cursor.execute(
-                    'SELECT wormholeClassID FROM mapLocationWormholeClasses WHERE locationID=?',
-                    (region_id, )
-                )
-                system_class = query.fetchone()
-                if system_class:
-                    system_class = system_class[0]
-                else:
-                    query = cursor.execute(
-                        'SELECT wormholeClassID FROM mapLocationWormholeClasses WHERE locationID=?',
-                        (system_id, )
-                    )
-                    system_class = query.fetchone()
-                    if system_class:
-                        system_class = system_class[0]
-                    else:
-                        system_class = "Unknown"
-
-                if system_class != "Unknown":
-                    if system_class in [1, 2, 3, 4, 5, 6, 12, 13, 14, 15, 16, 17, 18]:
-                        system_class = "C{}".format(system_class)
-                    else:
-                        if 0.45 <= security:
-                            system_class = "HS"
-                        elif 0 <= security < 0.45:
-                            system_class = "LS"
-                        else:
-                            system_class = "NS"
-
-                if security < 0:
-                    security_format = "{:.2f}".format(security)
-                elif 0 <= security <= 0.1:
-                    security_format = "0.1"
-                else:
-                    security_format = "{:.1f}".format(security)
-                f_out.write("{};{};{};{}\n".format(system_id, system_name, system_class, security_format))
+            for (system_id, system_name, security, wormhole_class) in result:
+                security = float(security)
+                f_out.write("{};{};{};{}\n".format(
+                    system_id,
+                    system_name,
+                    get_system_class(wormhole_class, security),
+                    format_security(security)
+                ))
+
+    write_binary(db_dir)
+    with open(sde_hash_file, "w") as f_out:
+        f_out.write(current_hash)
 
 
 if __name__ == "__main__":
@@ -10,9 +10,15 @@ from view.gui_main import Ui_MainWindow
 from view.gui_crest import Ui_CrestDialog
 from view.gui_tripwire import Ui_TripwireDialog
 from view.gui_about import Ui_AboutDialog
+from model.chainsource import FileSource
 from model.navigation import Navigation
 from model.navprocessor import NavProcessor
+from model.refreshscheduler import RefreshScheduler
+from model.routeprocessor import RouteProcessor
 from model.evedb import EveDb
+from model.httpclient import http_client
+from model.locationtracker import LocationTracker
+from model.universe import Universe
 from model.crestprocessor import CrestProcessor
 from model.versioncheck import VersionCheck
 
@@ -29,6 +35,33 @@ def dict_from_csvqfile(file_path):
     return reader
 
 
+class SystemNameCompleter(QtGui.QCompleter):
+    """
+    Solar system name completer backed by the EveDb prefix index
+    """
+
+    LIMIT = 50
+
+    def __init__(self, eve_db, line_edit, parent=None):
+        super(SystemNameCompleter, self).__init__(parent)
+        self.eve_db = eve_db
+        self.name_model = QtGui.QStringListModel(self)
+        self.setModel(self.name_model)
+        self.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.setCompletionMode(QtGui.QCompleter.UnfilteredPopupCompletion)
+        line_edit.setCompleter(self)
+        # noinspection PyUnresolvedReferences
+        line_edit.textEdited.connect(self.update_names)
+
+    @QtCore.Slot(str)
+    def update_names(self, text):
+        prefix = text.strip()
+        if prefix:
+            self.name_model.setStringList(self.eve_db.complete(prefix, SystemNameCompleter.LIMIT))
+        else:
+            self.name_model.setStringList([])
+
+
 class CrestDialog(QtGui.QDialog, Ui_CrestDialog):
     """
     CREST Configuration Window
@@ -67,13 +100,14 @@ class TripwireDialog(QtGui.QDialog, Ui_TripwireDialog):
     """
     Tripwire Configuration Window
     """
-    def __init__(self, trip_url, trip_user, trip_pass, evescout_enable, parent=None):
+    def __init__(self, trip_url, trip_user, trip_pass, evescout_enable, auto_refresh_interval, parent=None):
         super(TripwireDialog, self).__init__(parent)
         self.setupUi(self)
         self.lineEdit_url.setText(trip_url)
         self.lineEdit_user.setText(trip_user)
         self.lineEdit_pass.setText(trip_pass)
         self.checkBox_evescout.setChecked(evescout_enable)
+        self.spinBox_auto_refresh.setValue(auto_refresh_interval)
         self.label_evescout_logo.mouseDoubleClickEvent = TripwireDialog.logo_double_click
 
     @staticmethod
@@ -125,6 +159,9 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.tripwire_user = None
         self.tripwire_pass = None
         self.evescout_enable = None
+        self.auto_refresh_interval = None
+        self.chain_files = None
+        self.location_tracking = None
         self.crest_implicit = None
         self.crest_client_id = None
         self.crest_client_secret = None
@@ -139,12 +176,19 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         # Read stored settings
         self.read_settings()
 
-        # Read resources
-        gates = [[int(rows[0]), int(rows[1])] for rows in dict_from_csvqfile(":database/system_jumps.csv")]
-        system_desc = {
-            int(rows[0]): [rows[1], rows[2], float(rows[3])]
-            for rows in dict_from_csvqfile(":database/system_description.csv")
-        }
+        # Read resources (memory-mapped universe file, CSV files as fallback)
+        universe = Universe.load()
+        if universe:
+            gates = None
+            system_desc = universe.system_desc
+            gate_graph = universe.gate_graph
+        else:
+            gates = [[int(rows[0]), int(rows[1])] for rows in dict_from_csvqfile(":database/system_jumps.csv")]
+            system_desc = {
+                int(rows[0]): [rows[1], rows[2], float(rows[3])]
+                for rows in dict_from_csvqfile(":database/system_description.csv")
+            }
+            gate_graph = None
         wh_codes = {rows[0]: int(rows[1]) for rows in dict_from_csvqfile(":database/statics.csv")}
         self.nav = Navigation(
             gates,
@@ -152,8 +196,11 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             wh_codes,
             self.tripwire_url,
             self.tripwire_user,
-            self.tripwire_pass
+            self.tripwire_pass,
+            gate_graph=gate_graph
         )
+        for chain_file in self.chain_files:
+            self.nav.add_source(FileSource(self.nav.eve_db, chain_file))
 
         # Additional GUI setup
         self.additional_gui_setup()
@@ -175,6 +222,17 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         # noinspection PyUnresolvedReferences
         self.worker_thread.started.connect(self.nav_processor.process)
 
+        # Auto-refresh of the chain
+        self.refresh_scheduler = RefreshScheduler(self.auto_refresh_interval, self)
+        self.refresh_scheduler.refresh_due.connect(self.auto_refresh)
+
+        # Route thread (stays up, queries are queued to it)
+        self.route_thread = QtCore.QThread()
+        self.route_processor = RouteProcessor(self.nav)
+        self.route_processor.moveToThread(self.route_thread)
+        self.route_processor.finished.connect(self.route_done)
+        self.route_thread.start()
+
         # Version check thread
         self.version_thread = QtCore.QThread()
         self.version_check = VersionCheck()
@@ -194,9 +252,23 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.crestp.logout_response.connect(self.logout_handler)
         self.crestp.location_response.connect(self.location_handler)
         self.crestp.destination_response.connect(self.destination_handler)
+        self.location_tracker = LocationTracker(self.crestp, self)
+        self.location_tracker.system_changed.connect(self.location_changed)
+
+        # Warm start from the chain of the last session, reconciled by the first refresh
+        snapshot_time = self.nav.load_snapshot()
+        if snapshot_time:
+            self._trip_message(
+                "Using chain from {} min ago, refreshing...".format(int(max(0, time.time() - snapshot_time) / 60)),
+                MainWindow.MSG_INFO
+            )
 
-        # Start version check
+        # Start version check and auto-refresh
         self.version_thread.start()
+        if self.auto_refresh_interval > 0:
+            self.refresh_scheduler.start()
+        elif snapshot_time:
+            self._start_refresh()
 
     # noinspection PyUnresolvedReferences
     def additional_gui_setup(self):
@@ -211,16 +283,13 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.lineEdit_source.setFocus()
 
         # Auto-completion
-        system_list = self.nav.eve_db.system_name_list()
         for line_edit_field in [
             self.lineEdit_source,
             self.lineEdit_destination,
             self.lineEdit_avoid_name,
             self.lineEdit_set_dest,
         ]:
-            completer = QtGui.QCompleter(system_list, self)
-            completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-            line_edit_field.setCompleter(completer)
+            SystemNameCompleter(self.nav.eve_db, line_edit_field, self)
 
         # Signals
         self.pushButton_eve_login.clicked.connect(self.btn_eve_login_clicked)
@@ -229,6 +298,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.pushButton_crest_config.clicked.connect(self.btn_crest_config_clicked)
         self.pushButton_trip_config.clicked.connect(self.btn_trip_config_clicked)
         self.pushButton_trip_get.clicked.connect(self.btn_trip_get_clicked)
+        self.checkBox_location_tracking.toggled.connect(self.location_tracking_toggled)
         self.pushButton_avoid_add.clicked.connect(self.btn_avoid_add_clicked)
         self.pushButton_avoid_delete.clicked.connect(self.btn_avoid_delete_clicked)
         self.pushButton_avoid_clear.clicked.connect(self.btn_avoid_clear_clicked)
@@ -266,6 +336,19 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         # Eve-Scout
         self.evescout_enable = self.settings.value("evescout_enable", "false") == "true"
 
+        # Auto-refresh (seconds, 0 = disabled; opt-in, so a fresh install does not poll with placeholder credentials)
+        try:
+            self.auto_refresh_interval = max(0, int(self.settings.value("auto_refresh_interval", "0")))
+        except (TypeError, ValueError):
+            self.auto_refresh_interval = 0
+
+        # Additional chain sources (JSON/CSV files, see FileSource)
+        self.chain_files = [x for x in self.settings.value("chain_files", "").split(',') if x]
+
+        # Follow the character location while logged in
+        self.location_tracking = self.settings.value("location_tracking", "false") == "true"
+        self.checkBox_location_tracking.setChecked(self.location_tracking)
+
         # Avoidance list
         self.checkBox_avoid_enabled.setChecked(
             True if self.settings.value("avoidance_enabled", "false") == "true" else False
@@ -328,6 +411,15 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         # Eve-Scout
         self.settings.setValue("evescout_enable", self.evescout_enable)
 
+        # Auto-refresh
+        self.settings.setValue("auto_refresh_interval", self.auto_refresh_interval)
+
+        # Additional chain sources
+        self.settings.setValue("chain_files", ",".join(self.chain_files))
+
+        # Location tracking
+        self.settings.setValue("location_tracking", self.location_tracking)
+
         # Avoidance list
         self.settings.setValue(
             "avoidance_enabled",
@@ -476,6 +568,17 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.tableWidget_path.setRowCount(0)
         self.lineEdit_short_format.setText("")
 
+    def _route_busy(self, busy):
+        if busy:
+            self._path_message("Finding path...", MainWindow.MSG_INFO)
+            self.tableWidget_path.setCursor(QtCore.Qt.BusyCursor)
+        else:
+            self.tableWidget_path.unsetCursor()
+
+    def _route_cancel(self):
+        self.route_processor.cancel()
+        self._route_busy(False)
+
     def find_path(self):
         source_sys_name = self.nav.eve_db.normalize_name(
             self.lineEdit_source.text().strip()
@@ -486,6 +589,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         if self.avoidance_enabled():
             if dest_sys_name in self.avoidance_list():
+                self._route_cancel()
                 self._path_message("Destination in avoidance list, dummy ;)", MainWindow.MSG_ERROR)
                 self._clear_results()
                 return
@@ -503,41 +607,22 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         if source_sys_name and dest_sys_name:
             if self.avoidance_enabled():
-                [route, short_format] = self.nav.route(
-                    source_sys_name,
-                    dest_sys_name,
-                    self.avoidance_list(),
-                    size_restriction,
-                    security_prio,
-                    ignore_eol,
-                    ignore_masscrit,
-                    age_threshold
-                )
+                avoidance_list = self.avoidance_list()
             else:
-                [route, short_format] = self.nav.route(
-                    source_sys_name,
-                    dest_sys_name,
-                    [],
-                    size_restriction,
-                    security_prio,
-                    ignore_eol,
-                    ignore_masscrit,
-                    age_threshold
-                )
-
-            if route:
-                route_length = len(route)
-                if route_length == 1:
-                    self._path_message("Set the same source and destination :P", MainWindow.MSG_OK)
-                else:
-                    self._path_message("Total number of jumps: {}".format(route_length - 1), MainWindow.MSG_OK)
-
-                self.add_data_to_table(route)
-                self.lineEdit_short_format.setText(short_format)
-            else:
-                self._clear_results()
-                self._path_message("No path found between the solar systems.", MainWindow.MSG_ERROR)
+                avoidance_list = []
+            self.route_processor.submit(
+                source_sys_name,
+                dest_sys_name,
+                avoidance_list,
+                size_restriction,
+                security_prio,
+                ignore_eol,
+                ignore_masscrit,
+                age_threshold
+            )
+            self._route_busy(True)
         else:
+            self._route_cancel()
             self._clear_results()
             error_msg = []
             if not source_sys_name:
@@ -560,6 +645,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self.pushButton_player_location.setEnabled(True)
             self.pushButton_set_dest.setEnabled(True)
             self.eve_connected = True
+            if self.location_tracking:
+                self.location_tracker.start()
         else:
             self._statusbar_message("Error: Unable to connect with CREST", MainWindow.MSG_ERROR)
 
@@ -570,6 +657,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.pushButton_player_location.setEnabled(False)
         self.pushButton_set_dest.setEnabled(False)
         self.eve_connected = False
+        self.location_tracker.stop()
 
     @QtCore.Slot(str)
     def location_handler(self, location):
@@ -579,14 +667,41 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self._message_box("Player destination", "Unable to get location (character not online or CREST error)")
         self.pushButton_player_location.setEnabled(True)
 
+    @QtCore.Slot(str)
+    def location_changed(self, location):
+        self.lineEdit_source.setText(location)
+        # keep the displayed route starting from where the character is
+        if self.tableWidget_path.rowCount() > 0:
+            self.find_path()
+
     @QtCore.Slot(bool)
     def destination_handler(self, response):
         if not response:
             self._message_box("Player destination", "CREST error when trying to set destination")
         self.pushButton_set_dest.setEnabled(True)
 
-    @QtCore.Slot(int)
-    def thread_done(self, connections, evescout_connections):
+    @QtCore.Slot(int, object, str)
+    def route_done(self, request_id, route, short_format):
+        if request_id != self.route_processor.request_id:
+            # superseded by a newer query
+            return
+        self._route_busy(False)
+
+        if route:
+            route_length = len(route)
+            if route_length == 1:
+                self._path_message("Set the same source and destination :P", MainWindow.MSG_OK)
+            else:
+                self._path_message("Total number of jumps: {}".format(route_length - 1), MainWindow.MSG_OK)
+
+            self.add_data_to_table(route)
+            self.lineEdit_short_format.setText(short_format)
+        else:
+            self._clear_results()
+            self._path_message("No path found between the solar systems.", MainWindow.MSG_ERROR)
+
+    @QtCore.Slot(int, int, bool)
+    def thread_done(self, connections, evescout_connections, changed):
         self.worker_thread.quit()
 
         # wait for thread to finish
@@ -617,7 +732,10 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             )
 
         self.pushButton_trip_get.setEnabled(True)
-        self.pushButton_find_path.setEnabled(True)
+        self.refresh_scheduler.done(
+            connections >= 0 and (evescout_connections >= 0 or not self.evescout_enable),
+            changed
+        )
 
     @QtCore.Slot()
     def btn_eve_login_clicked(self):
@@ -627,6 +745,16 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         else:
             self.crestp.logout()
 
+    @QtCore.Slot(bool)
+    def location_tracking_toggled(self, state):
+        self.location_tracking = state
+        if not self.eve_connected:
+            return
+        if state:
+            self.location_tracker.start()
+        else:
+            self.location_tracker.stop()
+
     @QtCore.Slot()
     def btn_player_location_clicked(self):
         self.pushButton_player_location.setEnabled(False)
@@ -672,7 +800,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self.tripwire_url,
             self.tripwire_user,
             self.tripwire_pass,
-            self.evescout_enable
+            self.evescout_enable,
+            self.auto_refresh_interval
         )
         if tripwire_dialog.exec_():
             self.tripwire_url = tripwire_dialog.lineEdit_url.text()
@@ -684,18 +813,30 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                 self.tripwire_pass
             )
             self.evescout_enable = tripwire_dialog.checkBox_evescout.isChecked()
+            self.auto_refresh_interval = tripwire_dialog.spinBox_auto_refresh.value()
+            # new settings, forget the backoff of the old ones
+            self.refresh_scheduler.set_interval(self.auto_refresh_interval)
             if self.evescout_enable:
                 self.label_evescout_status.setText("Eve-Scout: enabled")
             else:
                 self.label_evescout_status.setText("Eve-Scout: disabled")
 
+    def _start_refresh(self):
+        self.pushButton_trip_get.setEnabled(False)
+        self.nav_processor.evescout_enable = self.evescout_enable
+        self.worker_thread.start()
+
+    @QtCore.Slot()
+    def auto_refresh(self):
+        if not self.worker_thread.isRunning():
+            self._start_refresh()
+        else:
+            self.refresh_scheduler.skip()
+
     @QtCore.Slot()
     def btn_trip_get_clicked(self):
         if not self.worker_thread.isRunning():
-            self.pushButton_trip_get.setEnabled(False)
-            self.pushButton_find_path.setEnabled(False)
-            self.nav_processor.evescout_enable = self.evescout_enable
-            self.worker_thread.start()
+            self._start_refresh()
         else:
             self._trip_message("Error! Process already running", MainWindow.MSG_ERROR)
 
@@ -784,6 +925,10 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
     # event: QCloseEvent
     def closeEvent(self, event):
         self.write_settings()
+        self.route_processor.cancel()
+        self.route_thread.quit()
+        self.route_thread.wait()
+        http_client.close()
         event.accept()
 
 
@@ -0,0 +1,65 @@
+# chainmerge.py
+
+
+class MergeIndex:
+    """
+    Deduplicates the wormhole connections reported by several chain sources
+
+    Records are keyed by the unordered system pair and the signature, so the same wormhole
+    reported by two sources (or once from each side) ends up as a single entry. Conflicts are
+    resolved by the last modified time, then by how complete the record is (signatures and codes
+    known), then in favor of the source added last. Every step is a dictionary lookup, so a merge
+    is linear in the number of records.
+    """
+
+    def __init__(self):
+        # (system A, system B, signature) -> (rank, origin, record), with A < B
+        self.entries = {}
+
+    @staticmethod
+    def _key(record):
+        source, dest, info = record
+        sig_source = (info[0] or "").upper()[:3]
+        sig_dest = (info[2] or "").upper()[:3]
+        if source <= dest:
+            return source, dest, sig_source or sig_dest
+        return dest, source, sig_dest or sig_source
+
+    @staticmethod
+    def _rank(record):
+        info = record[2]
+        return info[7], sum(1 for x in info[:4] if x)
+
+    def add(self, origin, connections):
+        """
+        :param origin: name of the chain source
+        :param connections: list of connection records (see ChainSource), None for a failed source
+        """
+        if not connections:
+            return
+        entries = self.entries
+        for record in connections:
+            key = MergeIndex._key(record)
+            rank = MergeIndex._rank(record)
+            entry = entries.get(key)
+            if entry is None or rank >= entry[0]:
+                entries[key] = (rank, origin, record)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def winners(self):
+        """
+        The map holds a single wormhole per system pair, the freshest signature is kept
+        :return: dictionary origin -> list of connection records
+        """
+        best = {}
+        for (source, dest, _), entry in self.entries.iteritems():
+            current = best.get((source, dest))
+            if current is None or entry[0] > current[0]:
+                best[(source, dest)] = entry
+
+        by_origin = {}
+        for _, origin, record in best.itervalues():
+            by_origin.setdefault(origin, []).append(record)
+        return by_origin
@@ -0,0 +1,163 @@
+# chainsource.py
+
+import csv
+import json
+import logging
+import os
+from timestamp import parse_timestamp
+
+
+class ChainSource:
+    """
+    Source of wormhole connections (Tripwire, Eve-Scout, local files...)
+
+    Sources return normalized connection records:
+        [source_id, dest_id, [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, last_modified]]
+    with the wormhole attributes encoded as in SolarMap.add_connection.
+    """
+
+    NAME = "Chain source"
+    # seconds a refresh waits for this source
+    DEADLINE = 10
+
+    WH_LIFE = {"stable": 1}
+    WH_MASS = {"stable": 2, "destab": 1}
+
+    def __init__(self, eve_db):
+        self.eve_db = eve_db
+
+    def get_name(self):
+        return self.NAME
+
+    def get_connections(self):
+        """
+        :return: list of connection records, None on error
+        """
+        raise NotImplementedError
+
+    def connection(self, source, dest, sig_source, code_source, sig_dest, code_dest, wh_life, wh_mass, last_modified):
+        """
+        Build a connection record, the wormhole size is resolved from the codes or the system classes
+        """
+        return [
+            source,
+            dest,
+            [
+                sig_source,
+                code_source,
+                sig_dest,
+                code_dest,
+                self.eve_db.get_whsize(source, dest, code_source or "", code_dest or ""),
+                wh_life,
+                wh_mass,
+                last_modified,
+            ],
+        ]
+
+    def augment_map(self, solar_map):
+        connections = self.get_connections()
+        if connections is None:
+            return -1
+
+        solar_map.add_connections(connections, self.get_name())
+        return len(connections)
+
+
+class FileSource(ChainSource):
+    """
+    Wormhole connections from a local JSON or CSV file (e.g. exported from another mapper)
+
+    Every record has the fields: source, destination (system IDs or names), sig_source, code_source,
+    sig_dest, code_dest, life ("stable", "critical"), mass ("stable", "destab", "critical") and
+    updated ("YYYY-MM-DD HH:MM:SS" UTC or seconds since the epoch, defaults to the file time).
+    JSON files hold a list of objects, CSV files a header row with the field names.
+    """
+
+    NAME = "File"
+    DEADLINE = 5
+
+    def __init__(self, eve_db, path):
+        ChainSource.__init__(self, eve_db)
+        self.path = path
+
+    def get_name(self):
+        return os.path.basename(self.path)
+
+    @staticmethod
+    def _time(value, default):
+        if not value:
+            return default
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            try:
+                return parse_timestamp(value)
+            except (ValueError, TypeError):
+                return default
+
+    def _system(self, value):
+        """
+        :return: system ID, None if the value is not a known system ID or name
+        """
+        try:
+            system_id = int(value)
+        except (ValueError, TypeError):
+            if not isinstance(value, basestring):
+                return None
+            name = self.eve_db.normalize_name(value)
+            system_id = self.eve_db.name2id(name) if name else None
+        return system_id if system_id in self.eve_db.system_desc else None
+
+    def _records(self):
+        with open(self.path, "rb") as f:
+            if self.path.lower().endswith(".json"):
+                records = json.load(f)
+                if not isinstance(records, list):
+                    raise ValueError("expected a list of records")
+                return records
+            return list(csv.DictReader(f))
+
+    def _connection(self, record, file_time):
+        """
+        :return: connection record, None if the systems are unknown
+        """
+        source = self._system(record.get("source"))
+        dest = self._system(record.get("destination"))
+        if not source or not dest:
+            return None
+
+        return self.connection(
+            source,
+            dest,
+            record.get("sig_source") or "",
+            record.get("code_source") or "",
+            record.get("sig_dest") or "",
+            record.get("code_dest") or "",
+            ChainSource.WH_LIFE.get((record.get("life") or "stable").lower(), 0),
+            ChainSource.WH_MASS.get((record.get("mass") or "stable").lower(), 0),
+            FileSource._time(record.get("updated"), file_time)
+        )
+
+    def get_connections(self):
+        try:
+            records = self._records()
+            file_time = os.path.getmtime(self.path)
+        except (IOError, OSError, ValueError, csv.Error) as e:
+            logging.warning("Unable to read chain file '{}': {}".format(self.path, e))
+            return None
+
+        connections = []
+        skipped = 0
+        for record in records:
+            try:
+                connection = self._connection(record, file_time)
+            except (AttributeError, TypeError, ValueError):
+                # not an object or a field of the wrong type, the other records are still used
+                connection = None
+            if connection is None:
+                skipped += 1
+            else:
+                connections.append(connection)
+        if skipped:
+            logging.warning("Skipped {} invalid records in chain file '{}'".format(skipped, self.path))
+        return connections
@@ -2,10 +2,12 @@
 
 import json
 import logging
+import os
 import threading
 import uuid
 import pycrest
 from pycrest.errors import APIException
+from pycrest.eve import DictCache, FileCache
 from server import StoppableHTTPServer, AuthHandler
 
 
@@ -15,6 +17,7 @@ class Crest:
     """
 
     SERVER_CLIENT_ID = "866fe9e6ac8a4e15ad41b9816d5de11e"
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".shortcircuit", "crest")
 
     def __init__(self, implicit, client_id, client_secret, login_callback, logout_callback):
         self.login_callback = login_callback
@@ -29,6 +32,12 @@ class Crest:
         self.char_id = None
         self.char_name = None
         self.sso_timer = None
+        # one cache for all connections, it survives credential changes and restarts
+        try:
+            self.cache = FileCache(Crest.CACHE_DIR)
+        except OSError:
+            logging.warning("Unable to use CREST cache directory '{}'".format(Crest.CACHE_DIR))
+            self.cache = DictCache()
 
         self.update_credentials(implicit, client_id, client_secret)
 
@@ -40,14 +49,16 @@ class Crest:
                 client_id=Crest.SERVER_CLIENT_ID,
                 api_key=None,
                 redirect_uri=self.client_callback,
-                testing=False
+                testing=False,
+                cache=self.cache
             )
         else:
             self.eve = pycrest.EVE(
                 client_id=client_id,
                 api_key=client_secret,
                 redirect_uri=self.client_callback,
-                testing=False
+                testing=False,
+                cache=self.cache
             )
 
     def start_server(self):
@@ -120,15 +131,23 @@ class Crest:
 
         self.stop_server()
 
-    def get_char_location(self):
-        current_location = None
+    def locate(self):
+        """
+        :return: (solar system name, docked, time the answer expires), None if the location is unknown
+        """
+        status = None
         if self.con:
             uri = '{}characters/{}/location/'.format(self.eve._authed_endpoint, self.char_id)
             try:
-                current_location = self.con.get(uri)['solarSystem']['name']
+                location = self.con.get(uri)
+                status = (location['solarSystem']['name'], 'station' in location, self.con.get_expires(uri))
             except (KeyError, TypeError, APIException):
                 pass
-        return current_location
+        return status
+
+    def get_char_location(self):
+        status = self.locate()
+        return status[0] if status else None
 
     def set_char_destination(self, sys_id):
         success = False
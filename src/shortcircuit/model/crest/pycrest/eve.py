@@ -1,9 +1,13 @@
 import os
 import base64
+import collections
+import hashlib
 import requests
+import threading
 import time
 import zlib
 from . import version
+from ...httpclient import http_client
 from compat import bytes_, text_
 from errors import APIException
 from weak_ciphers import WeakCiphersAdapter
@@ -22,15 +26,25 @@ try:
     from urllib.parse import quote
 except ImportError:  # pragma: no cover
     from urllib import quote
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
 import logging
 import re
 
 logger = logging.getLogger("pycrest.eve")
 cache_re = re.compile(r'max-age=([0-9]+)')
+# shared by all connections, like the pool of the other hosts (see HttpClient)
+weak_ciphers_adapter = WeakCiphersAdapter()
 
 
 class APICache(object):
-    def put(self, key, value):
+    def put(self, key, value, ttl=None):
+        """
+        :param ttl: seconds the value stays valid, None if unknown
+        """
         raise NotImplementedError
 
     def get(self, key):
@@ -41,43 +55,174 @@ class APICache(object):
 
 
 class FileCache(APICache):
-    def __init__(self, path):
-        self._cache = {}
-        self.path = path
-        if not os.path.isdir(self.path):
-            os.mkdir(self.path, 0o700)
+    """
+    LRU cache kept in memory and on disk, bounded by the number of entries and their size on disk
 
-    def _getpath(self, key):
-        return os.path.join(self.path, str(hash(key)) + '.cache')
+    Files are named after a hash of the key, so the cache is reused after a restart. Values are
+    pickled, compressed and written by a background thread, callers never wait for the disk.
+    Entries expire after their TTL.
+    """
 
-    def put(self, key, value):
-        with open(self._getpath(key), 'wb') as f:
-            f.write(zlib.compress(pickle.dumps(value, -1)))
-        self._cache[key] = value
-
-    def get(self, key):
-        if key in self._cache:
-            return self._cache[key]
+    MAX_ENTRIES = 256
+    MAX_BYTES = 8 * 1024 * 1024
 
+    def __init__(self, path, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+
+        # digest -> [expires (None until read from disk), value (None until loaded), size on disk]
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._scan()
+
+        self._queue = queue.Queue()
+        writer = threading.Thread(target=self._write_loop)
+        writer.setDaemon(True)
+        writer.start()
+
+    @staticmethod
+    def _canonical(key):
+        # sets have no stable order, sort them
+        if isinstance(key, (set, frozenset)):
+            return tuple(sorted(FileCache._canonical(x) for x in key))
+        if isinstance(key, (tuple, list)):
+            return tuple(FileCache._canonical(x) for x in key)
+        return key
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(bytes_(repr(FileCache._canonical(key)))).hexdigest()
+
+    def _getpath(self, digest):
+        return os.path.join(self.path, digest + '.cache')
+
+    def _scan(self):
+        """
+        Index the files of a previous run, least recently written first
+        """
+        files = []
+        for name in os.listdir(self.path):
+            digest, ext = os.path.splitext(name)
+            if ext != '.cache' or len(digest) != 40:
+                continue
+            try:
+                stat = os.stat(self._getpath(digest))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, digest, stat.st_size))
+        for _, digest, size in sorted(files):
+            self._entries[digest] = [None, None, size]
+            self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        """
+        Drop least recently used entries until within bounds (call with the lock held)
+        """
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            digest, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self._unlink(digest)
+
+    def _unlink(self, digest):
         try:
-            with open(self._getpath(key), 'rb') as f:
-                return pickle.loads(zlib.decompress(f.read()))
-        except IOError as ex:
-            if ex.errno == 2:  # file does not exist (yet)
-                return None
-            else:
-                raise
+            os.unlink(self._getpath(digest))
+        except OSError as ex:
+            if ex.errno != 2:  # does not exist
+                logger.warning('Unable to remove cache file %s: %s', digest, ex)
+
+    def _write_loop(self):
+        while True:
+            digest, entry, expires, value = self._queue.get()
+            try:
+                data = zlib.compress(pickle.dumps((expires, value), -1))
+                with open(self._getpath(digest), 'wb') as f:
+                    f.write(data)
+            except (IOError, OSError, pickle.PicklingError) as ex:
+                logger.warning('Unable to write cache file %s: %s', digest, ex)
+                data = ''
+            with self._lock:
+                if self._entries.get(digest) is entry:
+                    self._bytes += len(data) - entry[2]
+                    entry[2] = len(data)
+                    self._evict()
+                elif digest not in self._entries:
+                    # evicted or invalidated while being written
+                    self._unlink(digest)
+            self._queue.task_done()
+
+    def _read(self, digest):
+        """
+        :return: (expires, value), value is None if the file is missing or not readable
+        """
+        try:
+            with open(self._getpath(digest), 'rb') as f:
+                expires, value = pickle.loads(zlib.decompress(f.read()))
+            return expires, value
+        except (IOError, EOFError, ValueError, TypeError, zlib.error, pickle.UnpicklingError):
+            return None, None
+
+    def put(self, key, value, ttl=None):
+        digest = self._digest(key)
+        expires = time.time() + ttl if ttl else None
+        entry = [expires, value, 0]
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[digest] = entry
+            self._evict()
+        self._queue.put((digest, entry, expires, value))
+
+    def get(self, key):
+        digest = self._digest(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+        if entry is None:
+            return None
+
+        if entry[1] is None:
+            # written by a previous run
+            expires, value = self._read(digest)
+            with self._lock:
+                if self._entries.get(digest) is not entry:
+                    return None
+                if value is None:
+                    self._entries.pop(digest)
+                    self._bytes -= entry[2]
+                    self._unlink(digest)
+                    return None
+                entry[0] = expires
+                entry[1] = value
+
+        if entry[0] is not None and entry[0] <= time.time():
+            self.invalidate(key)
+            return None
+
+        with self._lock:
+            if self._entries.get(digest) is entry:
+                # most recently used
+                self._entries[digest] = self._entries.pop(digest)
+        return entry[1]
 
     def invalidate(self, key):
-        self._cache.pop(key, None)
+        digest = self._digest(key)
+        with self._lock:
+            entry = self._entries.pop(digest, None)
+            if entry is None:
+                return
+            self._bytes -= entry[2]
+            self._unlink(digest)
 
-        try:
-            os.unlink(self._getpath(key))
-        except OSError as ex:
-            if ex.errno == 2:  # does not exist
-                pass
-            else:
-                raise
+    def flush(self):
+        """
+        Wait until all pending values are on disk
+        """
+        self._queue.join()
 
 
 class DictCache(APICache):
@@ -87,7 +232,7 @@ class DictCache(APICache):
     def get(self, key):
         return self._dict.get(key, None)
 
-    def put(self, key, value):
+    def put(self, key, value, ttl=None):
         self._dict[key] = value
 
     def invalidate(self, key):
@@ -97,10 +242,12 @@ class DictCache(APICache):
 class APIConnection(object):
 
     TIMEOUT = 3
+    # seconds a call may take, retries included
+    DEADLINE = 8
 
     def __init__(self, additional_headers=None, user_agent=None, cache_dir=None, cache=None):
         # Set up a Requests Session
-        session = requests.Session()
+        session = http_client.new_session()
         if additional_headers is None:
             additional_headers = {}
         if user_agent is None:
@@ -112,9 +259,11 @@ class APIConnection(object):
         session.headers.update(additional_headers)
         session.mount(
             'https://public-crest.eveonline.com',
-            WeakCiphersAdapter()
+            weak_ciphers_adapter
         )
         self._session = session
+        # resource -> time its cached response expires
+        self._expires = {}
         if cache:
             if isinstance(cache, APICache):
                 self.cache = cache  # Inherit from parents
@@ -144,10 +293,11 @@ class APIConnection(object):
             prms[key] = params[key]
 
         # check cache
-        key = (resource, frozenset(self._session.headers.items()), frozenset(prms.items()))
+        key = self._cache_key(resource, prms)
         cached = self.cache.get(key)
         if cached and cached['expires'] > time.time():
             logger.debug('Cache hit for resource %s (params=%s)', resource, prms)
+            self._expires[resource] = cached['expires']
             return cached['payload']
         elif cached:
             logger.debug('Cache stale for resource %s (params=%s)', resource, prms)
@@ -157,7 +307,13 @@ class APIConnection(object):
 
         logger.debug('Getting resource %s (params=%s)', resource, prms)
         try:
-            res = self._session.get(resource, params=prms, timeout=APIConnection.TIMEOUT)
+            res = http_client.get(
+                resource,
+                params=prms,
+                timeout=APIConnection.TIMEOUT,
+                deadline=time.time() + APIConnection.DEADLINE,
+                session=self._session
+            )
         except requests.exceptions.RequestException:
             raise APIException("No response from server")
 
@@ -167,16 +323,29 @@ class APIConnection(object):
         ret = res.json()
 
         # cache result
-        key = (resource, frozenset(self._session.headers.items()), frozenset(prms.items()))
+        key = self._cache_key(resource, prms)
         expires = self._get_expires(res)
+        self._expires[resource] = time.time() + expires
         if expires > 0:
-            self.cache.put(key, {'expires': time.time() + expires, 'payload': ret})
+            self.cache.put(key, {'expires': time.time() + expires, 'payload': ret}, expires)
 
         return ret
 
+    def _cache_key(self, resource, prms):
+        # the access token changes on every login and refresh, leave it out so cached entries outlive it
+        # (authed resources are per character through their URL)
+        headers = frozenset((k, v) for k, v in self._session.headers.items() if k != "Authorization")
+        return resource, headers, frozenset(prms.items())
+
     def post(self, resource, data, params=None):
         try:
-            res = self._session.post(resource, data=data, params=params, timeout=APIConnection.TIMEOUT)
+            res = http_client.post(
+                resource,
+                data=data,
+                params=params,
+                timeout=APIConnection.TIMEOUT,
+                session=self._session
+            )
         except requests.exceptions.RequestException:
             raise APIException("No response from server")
 
@@ -185,6 +354,12 @@ class APIConnection(object):
 
         return res
 
+    def get_expires(self, resource):
+        """
+        :return: time the last response for resource stops being served from the cache, 0 if unknown
+        """
+        return self._expires.get(resource, 0)
+
     def _get_expires(self, response):
         if 'Cache-Control' not in response.headers:
             return 0
@@ -244,11 +419,12 @@ class EVE(APIConnection):
         auth = text_(base64.b64encode(bytes_("%s:%s" % (self.client_id, self.api_key))))
         headers = {"Authorization": "Basic %s" % auth}
         try:
-            res = self._session.post(
+            res = http_client.post(
                 "%s/token" % self._oauth_endpoint,
                 params=params,
                 headers=headers,
-                timeout=APIConnection.TIMEOUT
+                timeout=APIConnection.TIMEOUT,
+                session=self._session
             )
         except requests.exceptions.RequestException:
             raise APIException("No response from server")
@@ -1,14 +1,17 @@
 # crestprocessor.py
 
-import threading
 from PySide import QtCore
 from crest.crest import Crest
+from taskexecutor import TaskExecutor
 
 
 class CrestProcessor(QtCore.QObject):
     """
     CREST Middle-ware
     """
+    # the authed session is not thread-safe, requests run one at a time
+    WORKERS = 1
+
     login_response = QtCore.Signal(str)
     logout_response = QtCore.Signal()
     location_response = QtCore.Signal(str)
@@ -17,6 +20,7 @@ class CrestProcessor(QtCore.QObject):
     def __init__(self, implicit, client_id, client_secret, parent=None):
         super(CrestProcessor, self).__init__(parent)
         self.crest = Crest(implicit, client_id, client_secret, self._login_callback, self._logout_callback)
+        self.executor = TaskExecutor(CrestProcessor.WORKERS)
 
     def login(self):
         return self.crest.start_server()
@@ -25,22 +29,27 @@ class CrestProcessor(QtCore.QObject):
         self.crest.logout()
 
     def get_location(self):
-        server_thread = threading.Thread(target=self._get_location)
-        server_thread.setDaemon(True)
-        server_thread.start()
+        """
+        Requests made while one is still pending share its answer (and its location_response)
+        :return: Future of the location
+        """
+        return self.executor.submit("location", self._get_location)
 
     def _get_location(self):
         location = self.crest.get_char_location()
         self.location_response.emit(location)
+        return location
 
     def set_destination(self, sys_id):
-        server_thread = threading.Thread(target=self._set_destination, args=(sys_id, ))
-        server_thread.setDaemon(True)
-        server_thread.start()
+        """
+        :return: Future of the success flag
+        """
+        return self.executor.submit(("destination", sys_id), self._set_destination, sys_id)
 
     def _set_destination(self, sys_id):
         response = self.crest.set_char_destination(sys_id)
         self.destination_response.emit(response)
+        return response
 
     def _login_callback(self, char_name):
         self.login_response.emit(char_name)
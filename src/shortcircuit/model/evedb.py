@@ -1,13 +1,27 @@
 # evedb.py
 
+import bisect
+import os
+import sys
+from graph import GateGraph
+from landmarks import Landmarks
 from solarmap import SolarMap
 
 
+if getattr(sys, "frozen", False):
+    # PyInstaller bundle, the binary database files are added by build_win_installer.bat
+    DATABASE_DIR = os.path.join(sys._MEIPASS, "database")
+else:
+    DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "resources", "database")
+
+
 class EveDb:
     """
     Eve Database Handler
     """
 
+    LANDMARKS_FILE = os.path.join(DATABASE_DIR, "landmarks.bin")
+
     WHSIZE_S = 0
     WHSIZE_M = 1
     WHSIZE_L = 2
@@ -26,28 +40,49 @@ class EveDb:
         drifter={"kspace": 2, "C1": 1, "C2": 2, "C3": 2, "C4": 2, "C5": 2, "C6": 2, "C12": 2, "C13": 0, "drifter": 2},
     )
 
-    def __init__(self, gates, system_desc, wh_codes):
+    # database class -> SIZE_MATRIX class (others map to themselves)
+    SIZE_CLASS = dict(
+        HS="kspace", LS="kspace", NS="kspace", Unknown="kspace",
+        C14="drifter", C15="drifter", C16="drifter", C17="drifter", C18="drifter",
+    )
+
+    def __init__(self, gates, system_desc, wh_codes, gate_graph=None):
+        """
+        :param gates: gate rows, may be None if gate_graph is given
+        :param system_desc: system_id -> [name, class, security] mapping
+        :param wh_codes: wormhole code -> size
+        :param gate_graph: prebuilt static gate layer (e.g. from the binary universe file)
+        """
         self.gates = gates
         self.system_desc = system_desc
         self.wh_codes = wh_codes
+        # only sizes 0-3 are valid, other codes are treated as unknown
+        self._whsize_by_code = {
+            code.upper(): whsize for code, whsize in self.wh_codes.iteritems() if whsize in [0, 1, 2, 3]
+        }
+        if gate_graph is not None:
+            self.gate_graph = gate_graph
+        else:
+            self.gate_graph = GateGraph.build(
+                self.gates,
+                {system_id: self.system_type(system_id) for system_id in self.system_desc}
+            )
+        self.landmarks = None
+
+        # name lookups: exact and case-insensitive hash indexes, sorted keys for prefix completion
+        self._id_by_name = {}
+        self._name_by_key = {}
+        for system_id, description in self.system_desc.iteritems():
+            self._id_by_name[description[0]] = system_id
+            self._name_by_key[description[0].upper()] = description[0]
+        self._prefix_keys = sorted(self._name_by_key.keys())
 
     def get_whsize_by_code(self, code):
-        whsize = None
-        code = code.upper()
-        if code in self.wh_codes.keys():
-            whsize = self.wh_codes[code]
-
-        return whsize
+        return self._whsize_by_code.get(code.upper())
 
     def _get_class(self, system_id):
         db_class = self.system_desc[system_id][1]
-        if db_class in ["HS", "LS", "NS", "Unknown"]:
-            sys_class = "kspace"
-        elif db_class in ["C14", "C15", "C16", "C17", "C18"]:
-            sys_class = "drifter"
-        else:
-            sys_class = db_class
-        return sys_class
+        return EveDb.SIZE_CLASS.get(db_class, db_class)
 
     def system_type(self, system_id):
         """
@@ -74,21 +109,55 @@ class EveDb:
         dest_class = self._get_class(dest_id)
         return EveDb.SIZE_MATRIX[source_class][dest_class]
 
+    def get_whsize(self, source_id, dest_id, code_source, code_dest):
+        """
+        Wormhole size from the code of either side, or from the classes of the systems if both codes are unknown
+        """
+        whsize = self._whsize_by_code.get(code_source.upper())
+        if whsize is None:
+            whsize = self._whsize_by_code.get(code_dest.upper())
+            if whsize is None:
+                whsize = self.get_whsize_by_system(source_id, dest_id)
+        return whsize
+
     def get_solar_map(self):
-        solar_map = SolarMap(self)
-        for row in self.gates:
-            solar_map.add_connection(row[0], row[1], SolarMap.GATE)
+        """
+        :return: Solar map with an empty wormhole overlay on top of the shared static gate layer
+        """
+        return SolarMap(self)
 
-        return solar_map
+    def get_landmarks(self):
+        """
+        Landmark tables are generated by db_create.py, compute them here only if missing or outdated
+        """
+        if not self.landmarks:
+            self.landmarks = Landmarks.load(EveDb.LANDMARKS_FILE, self.gate_graph)
+            if not self.landmarks:
+                self.landmarks = Landmarks.compute(self.gate_graph)
+        return self.landmarks
 
     def system_name_list(self):
         return [x[0] for x in self.system_desc.values()]
 
+    def complete(self, prefix, limit=None):
+        """
+        Case-insensitive prefix completion (binary search over the sorted name keys)
+        :param prefix: beginning of a system name
+        :param limit: maximum number of names returned
+        :return: Matching system names, in alphabetical order
+        """
+        prefix = prefix.upper()
+        names = []
+        idx = bisect.bisect_left(self._prefix_keys, prefix)
+        while idx < len(self._prefix_keys) and self._prefix_keys[idx].startswith(prefix):
+            if limit is not None and len(names) >= limit:
+                break
+            names.append(self._name_by_key[self._prefix_keys[idx]])
+            idx += 1
+        return names
+
     def normalize_name(self, name):
-        for item in self.system_desc.values():
-            if name.upper() == item[0].upper():
-                return item[0]
-        return None
+        return self._name_by_key.get(name.upper())
 
     def id2name(self, idx):
         try:
@@ -98,8 +167,4 @@ class EveDb:
         return sys_name
 
     def name2id(self, name):
-        for key, value in self.system_desc.iteritems():
-            if value[0] == name:
-                return key
-
-        return None
+        return self._id_by_name.get(name)
@@ -1,83 +1,144 @@
 # evescout.py
 
+import json
 import logging
+import os
 import requests
-from datetime import datetime
-from solarmap import SolarMap
+import time
+from chainsource import ChainSource
+from httpclient import http_client
+from timestamp import parse_timestamp
 
 
-class EveScout:
+class EveScout(ChainSource):
     """
     Eve Scout Thera Connections
     """
+    NAME = "Eve-Scout"
+    DEADLINE = 5
     TIMEOUT = 2
+    CACHE_VERSION = 3
+    # private directory and plain JSON: the cache is read back at startup, it must not run anything
+    CACHE_FILE = os.path.join(os.path.expanduser("~"), ".shortcircuit", "evescout.cache")
 
-    def __init__(self, eve_db, url="https://www.eve-scout.com/api/wormholes"):
-        self.eve_db = eve_db
+    def __init__(self, eve_db, url="https://www.eve-scout.com/api/wormholes", cache_file=CACHE_FILE):
+        ChainSource.__init__(self, eve_db)
         self.evescout_url = url
+        self.cache_file = cache_file
+        # validators and parsed rows of the last full response
+        self.cache = None
 
-    def augment_map(self, solar_map):
-        connections = -1
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, "rb") as f:
+                cache = json.load(f)
+        except (IOError, ValueError):
+            # missing or unreadable cache, the next request will be a full one
+            return None
+        if (
+            not isinstance(cache, dict) or
+            cache.get("version") != EveScout.CACHE_VERSION or
+            cache.get("url") != self.evescout_url or
+            not isinstance(cache.get("etag"), (basestring, type(None))) or
+            not isinstance(cache.get("last_modified"), (basestring, type(None))) or
+            not isinstance(cache.get("rows"), list) or
+            not all(EveScout._valid_row(row) for row in cache["rows"])
+        ):
+            return None
+        return cache
+
+    @staticmethod
+    def _valid_row(row):
+        """
+        :return: True if row has the shape of a connection record (see ChainSource)
+        """
+        if not isinstance(row, list) or len(row) != 3 or not isinstance(row[2], list) or len(row[2]) != 8:
+            return False
+        source, dest, info = row
+        return (
+            all(isinstance(x, (int, long)) and not isinstance(x, bool) for x in [source, dest] + info[4:7]) and
+            all(isinstance(x, (basestring, type(None))) for x in info[:4]) and
+            isinstance(info[7], (int, long, float)) and not isinstance(info[7], bool)
+        )
+
+    def _save_cache(self):
+        try:
+            if not os.path.isdir(os.path.dirname(self.cache_file)):
+                os.makedirs(os.path.dirname(self.cache_file))
+            with open(self.cache_file, "wb") as f:
+                json.dump(self.cache, f)
+        except (IOError, OSError):
+            logging.warning("Unable to write Eve-Scout cache '{}'".format(self.cache_file))
+
+    def _parse(self, json_response):
+        """
+        :return: list of connection records (see ChainSource)
+        """
+        rows = []
+        for row in json_response:
+            source = row['sourceSolarSystem']['id']
+            dest = row['destinationSolarSystem']['id']
+            if source == 0 or dest == 0:
+                continue
+
+            eol = row['wormholeEol']
+            rows.append(self.connection(
+                source,
+                dest,
+                row['signatureId'],
+                row['sourceWormholeType']['name'],
+                row['wormholeDestinationSignatureId'],
+                row['destinationWormholeType']['name'],
+                ChainSource.WH_LIFE.get(eol, 0),
+                ChainSource.WH_MASS.get(eol, 0),
+                parse_timestamp(row['updatedAt'])
+            ))
+        return rows
+
+    def get_connections(self):
+        """
+        Conditional request: if the list did not change since the last response (this run or a
+        previous one, see CACHE_FILE) the server answers 304 and the parsed rows are reused
+        :return: list of connection records (see ChainSource), None on error
+        """
+        if self.cache is None:
+            self.cache = self._load_cache()
+
+        rows = None
         headers = {
             "User-Agent": "Short Circuit v.0.1.4-beta"
         }
+        if self.cache:
+            if self.cache.get("etag"):
+                headers["If-None-Match"] = self.cache["etag"]
+            if self.cache.get("last_modified"):
+                headers["If-Modified-Since"] = self.cache["last_modified"]
         try:
-            result = requests.get(
-                url=self.evescout_url,
+            result = http_client.get(
+                self.evescout_url,
                 headers=headers,
-                timeout=EveScout.TIMEOUT
+                timeout=EveScout.TIMEOUT,
+                deadline=time.time() + EveScout.DEADLINE
             )
         except requests.exceptions.RequestException as e:
             logging.error(e, exc_info=True)
         else:
-            if result.status_code == 200:
+            if result.status_code == 304 and self.cache:
+                rows = self.cache["rows"]
+            elif result.status_code == 200:
                 # we get some sort of response so at least something is working
-                connections = 0
-                json_response = result.json()
-                for row in json_response:
-                    connections += 1
-                    # Retrieve signature meta data
-                    source = row['sourceSolarSystem']['id']
-                    dest = row['destinationSolarSystem']['id']
-                    sig_source = row['signatureId']
-                    code_source = row['sourceWormholeType']['name']
-                    sig_dest = row['wormholeDestinationSignatureId']
-                    code_dest = row['destinationWormholeType']['name']
-                    if row['wormholeEol'] == 'stable':
-                        wh_life = 1
-                    else:
-                        wh_life = 0
-                    if row['wormholeEol'] == 'stable':
-                        wh_mass = 2
-                    elif row['wormholeEol'] == 'destab':
-                        wh_mass = 1
-                    else:
-                        wh_mass = 0
-
-                    # Compute time elapsed from this moment to when the signature was updated
-                    last_modified = datetime.strptime(row['updatedAt'][:-5], "%Y-%m-%dT%H:%M:%S")
-                    delta = datetime.utcnow() - last_modified
-                    time_elapsed = round(delta.total_seconds() / 3600.0, 1)
-
-                    if source != 0 and dest != 0:
-                        # Determine wormhole size
-                        size_result1 = self.eve_db.get_whsize_by_code(code_source)
-                        size_result2 = self.eve_db.get_whsize_by_code(code_dest)
-                        if size_result1 in [0, 1, 2, 3]:
-                            wh_size = size_result1
-                        elif size_result2 in [0, 1, 2, 3]:
-                            wh_size = size_result2
-                        else:
-                            # Wormhole codes are unknown => determine size based on class of wormholes
-                            wh_size = self.eve_db.get_whsize_by_system(source, dest)
+                rows = self._parse(result.json())
+                self.cache = {
+                    "version": EveScout.CACHE_VERSION,
+                    "url": self.evescout_url,
+                    "etag": result.headers.get("ETag"),
+                    "last_modified": result.headers.get("Last-Modified"),
+                    "rows": rows,
+                }
+                if self.cache["etag"] or self.cache["last_modified"]:
+                    self._save_cache()
 
-                        solar_map.add_connection(
-                            source,
-                            dest,
-                            SolarMap.WORMHOLE,
-                            [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, time_elapsed],
-                        )
-        return connections
+        return rows
 
 
 def main():
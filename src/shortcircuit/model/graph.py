@@ -0,0 +1,220 @@
+# graph.py
+
+import array
+import itertools
+import time
+import zlib
+
+
+class GateGraph:
+    """
+    Immutable static gate layer
+
+    Nodes are dense integer indices assigned in system ID order. Gates are kept in CSR form:
+    the neighbors of node u are neighbors[offsets[u]:offsets[u + 1]].
+    """
+
+    def __init__(self, ids, offsets, neighbors, security):
+        """
+        :param ids: system ID of every node, sorted
+        :param offsets: CSR offsets (one more than nodes)
+        :param neighbors: CSR gate neighbors
+        :param security: security type of every node (see EveDb.system_type)
+        """
+        self.ids = ids
+        self.index = dict(itertools.izip(ids, xrange(len(ids))))
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.security = security
+
+    @staticmethod
+    def build(gates, system_types):
+        """
+        :param gates: iterable of [source_id, destination_id] rows
+        :param system_types: dict system_id -> security type (see EveDb.system_type)
+        """
+        keys = set(system_types.keys())
+        for row in gates:
+            keys.add(row[0])
+            keys.add(row[1])
+
+        ids = array.array('i', sorted(keys))
+        index = {key: idx for idx, key in enumerate(ids)}
+        security = array.array('b', [system_types.get(key, 3) for key in ids])
+
+        adjacency = [set() for _ in xrange(len(ids))]
+        for row in gates:
+            u = index[row[0]]
+            v = index[row[1]]
+            adjacency[u].add(v)
+            adjacency[v].add(u)
+
+        offsets = array.array('i', [0]) * (len(ids) + 1)
+        neighbors = array.array('i')
+        for u in xrange(len(ids)):
+            neighbors.extend(sorted(adjacency[u]))
+            offsets[u + 1] = len(neighbors)
+
+        return GateGraph(ids, offsets, neighbors, security)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fingerprint(self):
+        """
+        :return: CRC32 of the node and gate arrays (identifies data derived from this graph)
+        """
+        checksum = zlib.crc32(self.ids.tostring())
+        checksum = zlib.crc32(self.offsets.tostring(), checksum)
+        checksum = zlib.crc32(self.neighbors.tostring(), checksum)
+        return checksum & 0xFFFFFFFF
+
+    def has_gate(self, u, v):
+        if u >= len(self.ids):
+            return False
+        return v in self.neighbors[self.offsets[u]:self.offsets[u + 1]]
+
+
+class WormholeOverlay:
+    """
+    Per-refresh wormhole layer on top of a GateGraph
+
+    Systems unknown to the gate layer get indices after the static ones. Wormholes are kept
+    in a table of parallel per-edge attribute arrays (one row per directed edge).
+    """
+
+    def __init__(self, gate_graph):
+        self.gate_graph = gate_graph
+        self.extra_ids = []
+        self.extra_index = {}
+
+        self.wh_source = array.array('i')
+        self.wh_dest = array.array('i')
+        self.wh_size = array.array('b')
+        self.wh_life = array.array('b')
+        self.wh_mass = array.array('b')
+        self.wh_time = array.array('d')
+        self.wh_sig = []
+        self.wh_code = []
+        # provenance: name of the chain source every edge came from
+        self.wh_origin = []
+        self.wh_adjacency = {}
+
+    def __len__(self):
+        return len(self.gate_graph) + len(self.extra_ids)
+
+    def node(self, key):
+        idx = self.gate_graph.index.get(key)
+        if idx is None:
+            idx = self.extra_index.get(key)
+        return idx
+
+    def key(self, idx):
+        static_count = len(self.gate_graph)
+        if idx < static_count:
+            return self.gate_graph.ids[idx]
+        return self.extra_ids[idx - static_count]
+
+    def add_node(self, key):
+        idx = self.node(key)
+        if idx is None:
+            idx = len(self)
+            self.extra_ids.append(key)
+            self.extra_index[key] = idx
+        return idx
+
+    def add_wormhole(self, u, v, sig, code, wh_size, wh_life, wh_mass, last_modified, origin=None):
+        """
+        Add (or overwrite) the directed wormhole edge u -> v
+        :param last_modified: time of the last signature update (seconds since the epoch)
+        :param origin: name of the chain source
+        :return: edge index
+        """
+        edges = self.wh_adjacency.setdefault(u, {})
+        edge = edges.get(v)
+        if edge is None:
+            edge = len(self.wh_source)
+            edges[v] = edge
+            self.wh_source.append(u)
+            self.wh_dest.append(v)
+            self.wh_size.append(wh_size)
+            self.wh_life.append(wh_life)
+            self.wh_mass.append(wh_mass)
+            self.wh_time.append(last_modified)
+            self.wh_sig.append(sig)
+            self.wh_code.append(code)
+            self.wh_origin.append(origin)
+        else:
+            self.wh_size[edge] = wh_size
+            self.wh_life[edge] = wh_life
+            self.wh_mass[edge] = wh_mass
+            self.wh_time[edge] = last_modified
+            self.wh_sig[edge] = sig
+            self.wh_code[edge] = code
+            self.wh_origin[edge] = origin
+        return edge
+
+    def add_wormholes(self, edges, origin=None):
+        """
+        Bulk version of add_wormhole: new edges are appended column by column in one go
+        :param edges: list of (u, v, sig, code, wh_size, wh_life, wh_mass, last_modified)
+        :param origin: name of the chain source of all edges
+        """
+        first_new = len(self.wh_source)
+        new_edges = []
+        for row in edges:
+            targets = self.wh_adjacency.get(row[0])
+            if targets is None:
+                targets = self.wh_adjacency[row[0]] = {}
+            edge = targets.get(row[1])
+            if edge is None:
+                targets[row[1]] = first_new + len(new_edges)
+                new_edges.append(row)
+            elif edge >= first_new:
+                # repeated within the batch, the last one wins
+                new_edges[edge - first_new] = row
+            else:
+                self.add_wormhole(*row, origin=origin)
+
+        if new_edges:
+            (sources, dests, sigs, codes, sizes, lives, masses, times) = zip(*new_edges)
+            self.wh_source.extend(sources)
+            self.wh_dest.extend(dests)
+            self.wh_sig.extend(sigs)
+            self.wh_code.extend(codes)
+            self.wh_size.extend(sizes)
+            self.wh_life.extend(lives)
+            self.wh_mass.extend(masses)
+            self.wh_time.extend(times)
+            self.wh_origin.extend([origin] * len(new_edges))
+
+    def wormhole_edge(self, u, v):
+        edges = self.wh_adjacency.get(u)
+        if edges:
+            return edges.get(v)
+        return None
+
+    def passable_wormholes(self, size_restriction, ignore_eol, ignore_masscrit, age_threshold, now=None):
+        """
+        Apply wormhole restrictions once per query
+        :param age_threshold: maximum age in hours (0 = no limit)
+        :param now: reference time for the age (seconds since the epoch), defaults to the current time
+        :return: dict u -> list of v reachable through an allowed wormhole
+        """
+        allowed = {}
+        size_restriction = set(size_restriction)
+        if age_threshold > 0:
+            oldest = (now or time.time()) - age_threshold * 3600.0
+        else:
+            oldest = None
+        for edge in xrange(len(self.wh_source)):
+            if self.wh_size[edge] not in size_restriction:
+                continue
+            if ignore_eol and self.wh_life[edge] == 0:
+                continue
+            if ignore_masscrit and self.wh_mass[edge] == 0:
+                continue
+            if oldest is not None and self.wh_time[edge] < oldest:
+                continue
+            allowed.setdefault(self.wh_source[edge], []).append(self.wh_dest[edge])
+        return allowed
@@ -0,0 +1,197 @@
+# httpclient.py
+
+import logging
+import threading
+import time
+import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised without touching the network while the circuit breaker of a host is open
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after THRESHOLD consecutive failures, then lets one trial request through every
+    COOLDOWN seconds until the host answers again
+    """
+
+    THRESHOLD = 3
+    COOLDOWN = 30
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.failures < CircuitBreaker.THRESHOLD:
+                return True
+            now = time.time()
+            if now < self.open_until:
+                return False
+            # half-open: this request is the trial, the others keep failing fast
+            self.open_until = now + CircuitBreaker.COOLDOWN
+            return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= CircuitBreaker.THRESHOLD:
+                self.open_until = time.time() + CircuitBreaker.COOLDOWN
+
+
+class HttpClient:
+    """
+    HTTP layer shared by Tripwire, Eve-Scout, the version check and pycrest
+
+    All sessions share one connection pool, so the TCP and TLS setup happens once per host and
+    the connection is kept alive between requests from any subsystem. At most POOL_PER_HOST
+    connections per host are kept alive (more may be open at the same time, the extra ones are
+    closed after use).
+
+    Every attempt is bounded by a timeout and by the deadline of the whole request (retries
+    included), so callers can tell how long a request may take at most. Idempotent requests are
+    retried with exponential backoff on connection errors, timeouts and 5xx responses, and a
+    circuit breaker per host fails fast once the host looks down.
+    """
+
+    TIMEOUT = 10
+    RETRIES = 2
+    BACKOFF = 0.5
+    RETRY_METHODS = ("GET", "HEAD")
+    POOL_HOSTS = 10
+    POOL_PER_HOST = 4
+
+    def __init__(self):
+        self.adapter = HTTPAdapter(pool_connections=HttpClient.POOL_HOSTS, pool_maxsize=HttpClient.POOL_PER_HOST)
+        self.session = self.new_session()
+        self.breakers = {}
+        # host -> request counters, see stats
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def new_session(self):
+        """
+        :return: requests session (own cookies and default headers) using the shared connection pool
+        """
+        session = requests.Session()
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def _count(self, host, name, value=1):
+        with self.lock:
+            metrics = self.metrics.get(host)
+            if metrics is None:
+                metrics = {"requests": 0, "retries": 0, "errors": 0, "time": 0.0}
+                self.metrics[host] = metrics
+            metrics[name] += value
+
+    def stats(self):
+        """
+        :return: dictionary host -> {"requests", "retries", "errors", "time" (seconds spent in requests),
+                 "connections" (opened by the pools still alive)}
+        """
+        with self.lock:
+            stats = dict((host, dict(metrics, connections=0)) for host, metrics in self.metrics.iteritems())
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else "{}:{}".format(pool.host, pool.port)
+            if host in stats:
+                stats[host]["connections"] += pool.num_connections
+        return stats
+
+    def close(self):
+        for host, metrics in sorted(self.stats().iteritems()):
+            logging.debug("{}: {}".format(host, metrics))
+        self.adapter.close()
+
+    def breaker(self, host):
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker()
+                self.breakers[host] = breaker
+            return breaker
+
+    @staticmethod
+    def _give_up(attempt, retries, deadline):
+        """
+        :return: True if there is no retry left or the backoff would end past the deadline
+        """
+        if attempt >= retries:
+            return True
+        return deadline is not None and time.time() + HttpClient.BACKOFF * 2 ** attempt >= deadline
+
+    def request(self, method, url, timeout=TIMEOUT, deadline=None, session=None, **kwargs):
+        """
+        :param timeout: timeout of a single attempt (seconds)
+        :param deadline: time the request has to be done by, retries included (seconds since the epoch)
+        :param session: requests session to send the request with (cookies, default headers), shared one if None
+        :param kwargs: passed to requests
+        :return: response, can be a 5xx one if the retries are exhausted
+        :raises requests.exceptions.RequestException: no response in time or circuit open
+        """
+        host = urlparse.urlsplit(url).netloc
+        breaker = self.breaker(host)
+        session = session or self.session
+        retries = HttpClient.RETRIES if method.upper() in HttpClient.RETRY_METHODS else 0
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError("{} is not responding, not trying again for now".format(host))
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.time())
+                if attempt_timeout <= 0:
+                    raise requests.exceptions.Timeout("Deadline exceeded for {}".format(url))
+
+            self._count(host, "requests" if attempt == 0 else "retries")
+            start = time.time()
+            try:
+                response = session.request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._count(host, "time", time.time() - start)
+                self._count(host, "errors")
+                breaker.failure()
+                if HttpClient._give_up(attempt, retries, deadline):
+                    raise
+            else:
+                self._count(host, "time", time.time() - start)
+                if response.status_code < 500:
+                    breaker.success()
+                    return response
+                self._count(host, "errors")
+                breaker.failure()
+                if HttpClient._give_up(attempt, retries, deadline):
+                    return response
+
+            delay = HttpClient.BACKOFF * 2 ** attempt
+            attempt += 1
+            logging.debug("Retrying {} {} in {}s".format(method, url, delay))
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+# process-wide client, the connection pool and the circuit breakers only work if everybody goes through it
+http_client = HttpClient()
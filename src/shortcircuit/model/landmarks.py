@@ -0,0 +1,166 @@
+# landmarks.py
+
+import array
+import collections
+import logging
+import struct
+import sys
+
+
+class Landmarks:
+    """
+    Landmark distance tables over the static gate graph (used by the A* heuristic)
+
+    Each table holds the number of gate jumps from one landmark to every system, so for any
+    two systems |d(L, a) - d(L, b)| is a lower bound on the gate jumps between them.
+    """
+
+    MAGIC = "SCLM"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHIHI")
+    UNREACHABLE = 0xFFFF
+    COUNT = 16
+
+    def __init__(self, nodes, tables):
+        self.nodes = nodes
+        self.tables = tables
+
+    @staticmethod
+    def _bfs(gate_graph, root):
+        offsets = gate_graph.offsets
+        neighbors = gate_graph.neighbors
+        table = array.array('H', [Landmarks.UNREACHABLE]) * len(gate_graph)
+        table[root] = 0
+        queue = collections.deque([root])
+        while queue:
+            current = queue.popleft()
+            next_distance = table[current] + 1
+            for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                if table[neighbor] == Landmarks.UNREACHABLE:
+                    table[neighbor] = next_distance
+                    queue.append(neighbor)
+        return table
+
+    @staticmethod
+    def compute(gate_graph, count=COUNT):
+        """
+        Farthest-point landmark selection: every new landmark is the system farthest away from
+        the already selected ones (disconnected gate clusters count as infinitely far away)
+        """
+        candidates = [
+            x for x in xrange(len(gate_graph)) if gate_graph.offsets[x] != gate_graph.offsets[x + 1]
+        ]
+        nodes = []
+        tables = []
+        if candidates:
+            # start from the system farthest away from the first candidate
+            table = Landmarks._bfs(gate_graph, candidates[0])
+            current = max(candidates, key=lambda x: (table[x] != Landmarks.UNREACHABLE, table[x]))
+            closest = array.array('H', [Landmarks.UNREACHABLE]) * len(gate_graph)
+            while len(nodes) < count:
+                table = Landmarks._bfs(gate_graph, current)
+                nodes.append(current)
+                tables.append(table)
+                for x in candidates:
+                    if table[x] < closest[x]:
+                        closest[x] = table[x]
+                current = max(candidates, key=lambda x: closest[x])
+                if closest[current] == 0:
+                    # every system is a landmark already
+                    break
+        return Landmarks(nodes, tables)
+
+    @staticmethod
+    def load(path, gate_graph):
+        """
+        :return: Landmarks stored in file, or None if missing or built for a different gate graph
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except IOError:
+            return None
+
+        try:
+            magic, version, total, count, fingerprint = Landmarks.HEADER.unpack_from(data)
+        except struct.error:
+            return None
+        if (
+            magic != Landmarks.MAGIC or
+            version != Landmarks.VERSION or
+            total != len(gate_graph) or
+            fingerprint != gate_graph.fingerprint()
+        ):
+            logging.warning("Landmark file '{}' does not match the gate graph".format(path))
+            return None
+
+        offset = Landmarks.HEADER.size
+        nodes = array.array('I')
+        nodes.fromstring(data[offset:offset + 4 * count])
+        offset += 4 * count
+        tables = []
+        for _ in xrange(count):
+            table = array.array('H')
+            table.fromstring(data[offset:offset + 2 * total])
+            offset += 2 * total
+            tables.append(table)
+        if sys.byteorder != "little":
+            nodes.byteswap()
+            for table in tables:
+                table.byteswap()
+
+        return Landmarks([int(x) for x in nodes], tables)
+
+    def save(self, path, gate_graph):
+        nodes = array.array('I', self.nodes)
+        tables = [array.array('H', x) for x in self.tables]
+        if sys.byteorder != "little":
+            nodes.byteswap()
+            for table in tables:
+                table.byteswap()
+
+        with open(path, "wb") as f:
+            f.write(Landmarks.HEADER.pack(
+                Landmarks.MAGIC,
+                Landmarks.VERSION,
+                len(gate_graph),
+                len(self.nodes),
+                gate_graph.fingerprint()
+            ))
+            f.write(nodes.tostring())
+            for table in tables:
+                f.write(table.tostring())
+
+    def lower_bound(self, source, target, active=4):
+        """
+        Only the landmarks giving the best bound between source and target are consulted,
+        which keeps the per-system cost low without weakening the estimate much
+        :param source: node index in the gate graph
+        :param target: node index in the gate graph
+        :param active: number of landmarks to use
+        :return: function node -> lower bound on gate jumps from node to target, infinity if there is
+                 no gate route (one of them is reachable from a landmark, the other one is not)
+        """
+        pairs = sorted(
+            [(table, table[target]) for table in self.tables],
+            key=lambda x: abs(x[0][source] - x[1]),
+            reverse=True
+        )[:active]
+
+        unreachable = Landmarks.UNREACHABLE
+        infinity = float('inf')
+
+        def bound(node):
+            best = 0
+            for table, distance in pairs:
+                node_distance = table[node]
+                if node_distance == unreachable or distance == unreachable:
+                    if node_distance != distance:
+                        # different gate clusters
+                        return infinity
+                    continue
+                best = max(best, abs(node_distance - distance))
+            return best
+
+        return bound
+
@@ -0,0 +1,71 @@
+# locationtracker.py
+
+import time
+from PySide import QtCore
+
+
+class LocationTracker(QtCore.QObject):
+    """
+    Follows the location of the logged in character
+
+    Polls often while the character is moving, backs off while it stays in the same system (more
+    so when docked) and never asks again before the cached answer of the endpoint expires.
+    """
+
+    MOVING_INTERVAL = 5
+    IDLE_STEP = 1.5
+    IDLE_INTERVAL = 30
+    DOCKED_INTERVAL = 60
+    ERROR_INTERVAL = 60
+
+    system_changed = QtCore.Signal(str)
+    # poll result, delivered from the CREST worker to the thread of the tracker
+    _polled = QtCore.Signal(object)
+
+    def __init__(self, crestp, parent=None):
+        super(LocationTracker, self).__init__(parent)
+        self.crestp = crestp
+        self.system = None
+        self.interval = LocationTracker.MOVING_INTERVAL
+        self.active = False
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._poll)
+        self._polled.connect(self._poll_done)
+
+    def start(self):
+        self.active = True
+        self.system = None
+        self.interval = LocationTracker.MOVING_INTERVAL
+        self.timer.start(0)
+
+    def stop(self):
+        self.active = False
+        self.timer.stop()
+
+    def _poll(self):
+        future = self.crestp.executor.submit("track", self.crestp.crest.locate)
+        future.add_done_callback(lambda f: self._polled.emit(None if f.exception() else f.result()))
+
+    def _poll_done(self, status):
+        """
+        :param status: (solar system name, docked, time the answer expires), None on error
+        """
+        if not self.active:
+            return
+
+        if status is None:
+            delay = LocationTracker.ERROR_INTERVAL
+        else:
+            system, docked, expires = status
+            if system != self.system:
+                self.system = system
+                self.interval = LocationTracker.MOVING_INTERVAL
+                self.system_changed.emit(system)
+            elif docked:
+                self.interval = LocationTracker.DOCKED_INTERVAL
+            else:
+                self.interval = min(self.interval * LocationTracker.IDLE_STEP, LocationTracker.IDLE_INTERVAL)
+            # asking before the cached answer expires would only return the same answer
+            delay = max(self.interval, expires - time.time())
+        self.timer.start(int(delay * 1000))
@@ -1,38 +1,110 @@
 # navigation.py
 
+import time
+from chainmerge import MergeIndex
 from evedb import EveDb
+from routecache import RouteCache
+from snapshot import ChainSnapshot
 from solarmap import SolarMap
 from evescout import EveScout
 from tripwire import Tripwire
 
 
-class Navigation:
+class Navigation(object):
     """
     Navigation
     """
-    def __init__(self, gates, system_desc, wh_codes, trip_url, trip_user, trip_pass):
-        self.eve_db = EveDb(gates, system_desc, wh_codes)
+
+    AGE_CACHE_WINDOW = 60
+
+    def __init__(self, gates, system_desc, wh_codes, trip_url, trip_user, trip_pass, gate_graph=None):
+        self.eve_db = EveDb(gates, system_desc, wh_codes, gate_graph)
+        self.route_cache = RouteCache()
+        self._solar_map = None
         self.solar_map = self.eve_db.get_solar_map()
         self.trip_url = None
         self.trip_user = None
         self.trip_pass = None
+        self.tripwire = None
+        self.evescout = EveScout(self.eve_db)
+        self.sources = []
         self.tripwire_set_login(trip_url, trip_user, trip_pass)
 
+    @property
+    def solar_map(self):
+        return self._solar_map
+
+    @solar_map.setter
+    def solar_map(self, solar_map):
+        # any new map (Tripwire refresh, chain reset) makes cached routes obsolete
+        self._solar_map = solar_map
+        self.route_cache.invalidate()
+
     def reset_chain(self):
         self.solar_map = self.eve_db.get_solar_map()
+        ChainSnapshot.remove()
+
+    def load_snapshot(self):
+        """
+        Warm start: use the wormholes of the last session until the first refresh
+        :return: time the snapshot was saved, None if there is no usable snapshot
+        """
+        snapshot = ChainSnapshot.load(self.eve_db)
+        if not snapshot:
+            return None
+        self.solar_map, saved_at = snapshot
+        return saved_at
+
+    def save_snapshot(self):
+        ChainSnapshot.save(self.solar_map)
 
     def tripwire_set_login(self, trip_url, trip_user, trip_pass):
+        if (trip_url, trip_user, trip_pass) != (self.trip_url, self.trip_user, self.trip_pass):
+            # new credentials need a new session
+            self.tripwire = None
         self.trip_url = trip_url
         self.trip_user = trip_user
         self.trip_pass = trip_pass
 
-    def evescout_augment(self, solar_map):
-        evescout = EveScout(self.eve_db)
-        return evescout.augment_map(solar_map)
+    def add_source(self, source):
+        """
+        :param source: additional ChainSource, merged after Tripwire and Eve-Scout
+        """
+        self.sources.append(source)
+
+    def remove_source(self, source):
+        self.sources.remove(source)
+
+    def get_tripwire(self):
+        trip = self.tripwire
+        if not trip:
+            trip = Tripwire(self.eve_db, self.trip_user, self.trip_pass, self.trip_url)
+            self.tripwire = trip
+        return trip
 
-    def tripwire_augment(self, solar_map):
-        trip = Tripwire(self.eve_db, self.trip_user, self.trip_pass, self.trip_url)
-        return trip.augment_map(solar_map)
+    def chain_sources(self, evescout_enable):
+        """
+        :return: sources to refresh, in merge order (later sources win)
+        """
+        sources = [self.get_tripwire()]
+        if evescout_enable:
+            sources.append(self.evescout)
+        return sources + self.sources
+
+    @staticmethod
+    def merge_connections(solar_map, *sources):
+        """
+        Add the wormhole connections of all sources to the map, the same wormhole reported by several
+        sources is added once, from the freshest record
+        :param sources: (source name, list of connection records or None for failed sources) pairs
+        :return: MergeIndex of the connections
+        """
+        index = MergeIndex()
+        for origin, connections in sources:
+            index.add(origin, connections)
+        for origin, connections in index.winners().iteritems():
+            solar_map.add_connections(connections, origin)
+        return index
 
     @staticmethod
     def _get_instructions(weight):
@@ -50,11 +122,12 @@ class Navigation:
         return instructions
 
     @staticmethod
-    def _get_additional_info(weight, weight_back):
+    def _get_additional_info(weight, weight_back, origin=None):
         info = ""
         if weight and weight_back:
             if weight_back[0] == SolarMap.WORMHOLE:
-                [wh_sig, wh_code, wh_size, wh_life, wh_mass, time_elapsed] = weight_back[1]
+                [wh_sig, wh_code, wh_size, wh_life, wh_mass, last_modified] = weight_back[1]
+                time_elapsed = round((time.time() - last_modified) / 3600.0, 1)
                 # Wormhole size
                 if wh_size == 0:
                     wh_size_text = "Small"
@@ -90,6 +163,8 @@ class Navigation:
                     wh_mass_text,
                     time_elapsed
                 )
+                if origin:
+                    info += ", Source: {}".format(origin)
 
         return info
 
@@ -104,29 +179,47 @@ class Navigation:
             ignore_masscrit,
             age_threshold
     ):
+        version = self.route_cache.version
+        solar_map = self.solar_map
         source_id = self.eve_db.name2id(source)
         dest_id = self.eve_db.name2id(destination)
-        if security_prio:
-            path = self.solar_map.shortest_path_weighted(
-                source_id,
-                dest_id,
-                [self.eve_db.name2id(x) for x in avoidance_list],
-                size_restriction,
-                security_prio,
-                ignore_eol,
-                ignore_masscrit,
-                age_threshold
-            )
-        else:
-            path = self.solar_map.shortest_path(
-                source_id,
-                dest_id,
-                [self.eve_db.name2id(x) for x in avoidance_list],
-                size_restriction,
-                ignore_eol,
-                ignore_masscrit,
-                age_threshold
-            )
+        avoidance_ids = [self.eve_db.name2id(x) for x in avoidance_list]
+        cache_key = (
+            source_id,
+            dest_id,
+            frozenset(avoidance_ids),
+            frozenset(size_restriction),
+            tuple(security_prio),
+            ignore_eol,
+            ignore_masscrit,
+            age_threshold,
+            # wormholes age while the path is cached, age-limited paths are only reused for a minute
+            int(time.time() // Navigation.AGE_CACHE_WINDOW) if age_threshold > 0 else None,
+        )
+        path = self.route_cache.get(cache_key)
+        if path is None:
+            if security_prio:
+                path = solar_map.shortest_path_weighted(
+                    source_id,
+                    dest_id,
+                    avoidance_ids,
+                    size_restriction,
+                    security_prio,
+                    ignore_eol,
+                    ignore_masscrit,
+                    age_threshold
+                )
+            else:
+                path = solar_map.shortest_path(
+                    source_id,
+                    dest_id,
+                    avoidance_ids,
+                    size_restriction,
+                    ignore_eol,
+                    ignore_masscrit,
+                    age_threshold
+                )
+            self.route_cache.put(cache_key, path, version)
 
         route = []
         short_format = ""
@@ -135,16 +228,18 @@ class Navigation:
         for idx, x in enumerate(path):
             # Construct route
             if idx < len(path) - 1:
-                source = self.solar_map.get_system(x)
-                dest = self.solar_map.get_system(path[idx + 1])
+                source = solar_map.get_system(x)
+                dest = solar_map.get_system(path[idx + 1])
                 weight = source.get_weight(dest)
                 weight_back = dest.get_weight(source)
+                origin = dest.get_origin(source)
             else:
                 weight = None
                 weight_back = None
+                origin = None
             system_description = list(self.eve_db.system_desc[x])
             system_description.append(Navigation._get_instructions(weight))
-            system_description.append(Navigation._get_additional_info(weight, weight_back))
+            system_description.append(Navigation._get_additional_info(weight, weight_back, origin))
             route.append(system_description)
 
             # Build short format message (travelling between multiple consecutive gates will be denoted as '...')
@@ -1,5 +1,8 @@
 # navprocessor.py
 
+import logging
+import threading
+import time
 from PySide import QtCore
 
 
@@ -8,20 +11,74 @@ class NavProcessor(QtCore.QObject):
     Navigation Processor (will work in a separate thread)
     """
 
-    finished = QtCore.Signal(int, int)
+    finished = QtCore.Signal(int, int, bool)
 
     def __init__(self, nav, parent=None):
         super(NavProcessor, self).__init__(parent)
         self.evescout_enable = False
         self.nav = nav
+        self.last_chain = None
+
+    @staticmethod
+    def _fetch(source):
+        """
+        Run source.get_connections in a daemon thread
+        :return: (source, thread, result list receiving the connections)
+        """
+        result = []
+        fetch_thread = threading.Thread(target=lambda: result.append(source.get_connections()))
+        fetch_thread.setDaemon(True)
+        fetch_thread.start()
+        return source, fetch_thread, result
+
+    @staticmethod
+    def _wait(fetch, deadline):
+        """
+        :return: connections of the fetch, None on error or if not done by the deadline
+        """
+        source, fetch_thread, result = fetch
+        fetch_thread.join(max(0, deadline - time.time()))
+        if not result:
+            if fetch_thread.isAlive():
+                logging.warning("{} did not respond in time".format(source.get_name()))
+            return None
+        return result[0]
 
     def process(self):
-        solar_map = self.nav.eve_db.get_solar_map()
-        connections = self.nav.tripwire_augment(solar_map)
-        if self.evescout_enable:
-            evescout_connections = self.nav.evescout_augment(solar_map)
-        else:
-            evescout_connections = 0
-        if connections > 0 or evescout_connections > 0:
+        # every source has its own deadline (seconds from the start of the refresh)
+        start = time.time()
+        sources = self.nav.chain_sources(self.evescout_enable)  # Tripwire first
+        fetches = [NavProcessor._fetch(source) for source in sources]
+        results = [NavProcessor._wait(fetch, start + fetch[0].DEADLINE) for fetch in fetches]
+        counts = dict((source, len(result) if result is not None else -1) for source, result in zip(sources, results))
+        connections = counts[sources[0]]
+        evescout_connections = counts.get(self.nav.evescout, 0)
+
+        # compare the chain without the update times to tell if anything changed
+        changed = False
+        if results[0] is not None:
+            chain = frozenset(
+                (source, dest, tuple(info[:-1])) for result in results if result for source, dest, info in result
+            )
+            changed = chain != self.last_chain
+            self.last_chain = chain
+
+        names = [x.get_name() for x in sources]
+        if connections >= 0:
+            # a successful refresh replaces the chain, even an empty one (it may replace a snapshot)
+            solar_map = self.nav.eve_db.get_solar_map()
+            self.nav.merge_connections(solar_map, *zip(names, results))
+            self.nav.solar_map = solar_map
+            self.nav.save_snapshot()
+        elif any(x > 0 for x in counts.values()):
+            # Tripwire failed: keep the chain we have (e.g. a warm-started snapshot) and only refresh
+            # the connections of the sources which answered; a partial chain is not saved
+            answered = set(name for name, result in zip(names, results) if result is not None)
+            kept = [
+                (origin, rows) for origin, rows in self.nav.solar_map.get_connections().iteritems()
+                if origin not in answered
+            ]
+            solar_map = self.nav.eve_db.get_solar_map()
+            self.nav.merge_connections(solar_map, *(kept + zip(names, results)))
             self.nav.solar_map = solar_map
-        self.finished.emit(connections, evescout_connections)
+        self.finished.emit(connections, evescout_connections, changed)
@@ -0,0 +1,74 @@
+# refreshscheduler.py
+
+from PySide import QtCore
+
+
+class RefreshScheduler(QtCore.QObject):
+    """
+    Decides when the next chain refresh is due
+
+    Refreshes that bring no changes stretch the interval (up to IDLE_FACTOR times the base
+    interval), a change brings it back to the base interval and errors back off exponentially.
+    """
+
+    IDLE_FACTOR = 5
+    IDLE_STEP = 1.5
+    MAX_BACKOFF = 900
+
+    refresh_due = QtCore.Signal()
+
+    def __init__(self, interval, parent=None):
+        """
+        :param interval: base interval in seconds, 0 disables the scheduler
+        """
+        super(RefreshScheduler, self).__init__(parent)
+        self.interval = interval
+        self.current_interval = interval
+        self.errors = 0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.refresh_due)
+
+    def _schedule(self, seconds):
+        self.timer.stop()
+        if self.interval > 0:
+            self.timer.start(int(seconds * 1000))
+
+    def set_interval(self, interval):
+        self.interval = interval
+        self.current_interval = interval
+        self.errors = 0
+        self._schedule(interval)
+
+    def start(self, delay=0):
+        self._schedule(delay)
+
+    def stop(self):
+        self.timer.stop()
+
+    def skip(self):
+        """
+        The due refresh did not run (previous one still in progress), try again later
+        """
+        self._schedule(self.current_interval)
+
+    def done(self, success, changed):
+        """
+        Schedule the next refresh based on the outcome of the last one (manual ones included)
+        :param success: False if any source failed
+        :param changed: True if the chain changed since the previous refresh
+        """
+        if not success:
+            self.errors += 1
+            delay = min(self.interval * 2 ** self.errors, max(self.interval, RefreshScheduler.MAX_BACKOFF))
+        else:
+            self.errors = 0
+            if changed:
+                self.current_interval = self.interval
+            else:
+                self.current_interval = min(
+                    self.current_interval * RefreshScheduler.IDLE_STEP,
+                    self.interval * RefreshScheduler.IDLE_FACTOR
+                )
+            delay = self.current_interval
+        self._schedule(delay)
@@ -0,0 +1,58 @@
+# routecache.py
+
+import collections
+import threading
+
+
+class RouteCache:
+    """
+    Bounded LRU cache of computed paths, tagged with the solar map version they were computed on
+    """
+
+    SIZE = 64
+
+    def __init__(self, size=SIZE):
+        self.size = size
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Called whenever the solar map changes: bump the version and drop every entry
+        """
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry and entry[0] == self.version:
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, path, version):
+        """
+        :param version: map version the path was computed on (entry is dropped if already outdated)
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (version, path)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
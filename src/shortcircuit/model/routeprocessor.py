@@ -0,0 +1,44 @@
+# routeprocessor.py
+
+from PySide import QtCore
+
+
+class RouteProcessor(QtCore.QObject):
+    """
+    Route Processor (will work in a separate thread)
+
+    Only the most recent query matters: queries superseded while waiting in the queue are
+    dropped without being computed and results of superseded queries are never emitted.
+    """
+
+    requested = QtCore.Signal(int, object)
+    finished = QtCore.Signal(int, object, str)
+
+    def __init__(self, nav, parent=None):
+        super(RouteProcessor, self).__init__(parent)
+        self.nav = nav
+        self.request_id = 0
+        self.requested.connect(self.process)
+
+    def submit(self, *args):
+        """
+        Queue a route query (arguments of Navigation.route), superseding any query in flight
+        :return: request ID reported back by the finished signal
+        """
+        self.request_id += 1
+        self.requested.emit(self.request_id, args)
+        return self.request_id
+
+    def cancel(self):
+        """
+        Discard the query in flight, if any
+        """
+        self.request_id += 1
+
+    @QtCore.Slot(int, object)
+    def process(self, request_id, args):
+        if request_id != self.request_id:
+            return
+        [route, short_format] = self.nav.route(*args)
+        if request_id == self.request_id:
+            self.finished.emit(request_id, route, short_format)
@@ -0,0 +1,125 @@
+# snapshot.py
+
+import logging
+import os
+import struct
+import time
+
+
+class ChainSnapshot:
+    """
+    Wormhole overlay of the last successful refresh, kept on disk for a warm start
+
+    Layout (little-endian): header, then one record per directed wormhole edge followed by
+    the signature, the wormhole code and the name of the chain source it came from.
+    """
+
+    FILE = os.path.join(os.path.expanduser("~"), ".shortcircuit", "chain.snapshot")
+    # origin of the edges saved without one
+    ORIGIN = "Snapshot"
+    MAGIC = "SCCS"
+    VERSION = 2
+    # magic, version, saved at, edges
+    HEADER = struct.Struct("<4sHdI")
+    # source ID, destination ID, size, life, mass, last modified, signature, code and origin lengths
+    RECORD = struct.Struct("<iibbbdBBB")
+
+    @staticmethod
+    def _encode(text):
+        if text is None:
+            return ""
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
+        return str(text)[:255]
+
+    @staticmethod
+    def save(solar_map, path=FILE):
+        overlay = solar_map.overlay
+        chunks = [ChainSnapshot.HEADER.pack(
+            ChainSnapshot.MAGIC,
+            ChainSnapshot.VERSION,
+            time.time(),
+            len(overlay.wh_source)
+        )]
+        for edge in xrange(len(overlay.wh_source)):
+            sig = ChainSnapshot._encode(overlay.wh_sig[edge])
+            code = ChainSnapshot._encode(overlay.wh_code[edge])
+            origin = ChainSnapshot._encode(overlay.wh_origin[edge])
+            chunks.append(ChainSnapshot.RECORD.pack(
+                overlay.key(overlay.wh_source[edge]),
+                overlay.key(overlay.wh_dest[edge]),
+                overlay.wh_size[edge],
+                overlay.wh_life[edge],
+                overlay.wh_mass[edge],
+                overlay.wh_time[edge],
+                len(sig),
+                len(code),
+                len(origin)
+            ))
+            chunks.append(sig)
+            chunks.append(code)
+            chunks.append(origin)
+
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as f:
+                f.write("".join(chunks))
+        except (IOError, OSError):
+            logging.warning("Unable to write chain snapshot '{}'".format(path))
+
+    @staticmethod
+    def load(eve_db, path=FILE):
+        """
+        :return: (solar map, time the snapshot was saved), None if missing or not readable
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except IOError:
+            return None
+
+        try:
+            magic, version, saved_at, edges = ChainSnapshot.HEADER.unpack_from(data)
+            if magic != ChainSnapshot.MAGIC or version != ChainSnapshot.VERSION:
+                logging.warning("Unsupported chain snapshot '{}'".format(path))
+                return None
+
+            solar_map = eve_db.get_solar_map()
+            overlay = solar_map.overlay
+            offset = ChainSnapshot.HEADER.size
+            rows = {}
+            for _ in xrange(edges):
+                (source, dest, wh_size, wh_life, wh_mass, last_modified, sig_length, code_length, origin_length) = \
+                    ChainSnapshot.RECORD.unpack_from(data, offset)
+                offset += ChainSnapshot.RECORD.size
+                sig = data[offset:offset + sig_length].decode("utf-8")
+                offset += sig_length
+                code = data[offset:offset + code_length].decode("utf-8")
+                offset += code_length
+                origin = data[offset:offset + origin_length].decode("utf-8") or ChainSnapshot.ORIGIN
+                offset += origin_length
+                rows.setdefault(origin, []).append((
+                    overlay.add_node(source),
+                    overlay.add_node(dest),
+                    sig,
+                    code,
+                    wh_size,
+                    wh_life,
+                    wh_mass,
+                    last_modified
+                ))
+            for origin, origin_rows in rows.iteritems():
+                overlay.add_wormholes(origin_rows, origin)
+        except (struct.error, UnicodeDecodeError):
+            logging.warning("Corrupted chain snapshot '{}'".format(path))
+            return None
+
+        return solar_map, saved_at
+
+    @staticmethod
+    def remove(path=FILE):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,58 +1,106 @@
 # solarmap.py
 
+import array
 import collections
 import heapq
+import itertools
+from graph import WormholeOverlay
 
 
 class SolarSystem:
     """
-    Solar system handler
+    Solar system handler (lightweight view over a node of the solar map graph)
     """
 
-    def __init__(self, key):
-        self.id = key
-        self.connected_to = {}
+    def __init__(self, solar_map, idx):
+        self.solar_map = solar_map
+        self.idx = idx
 
-    def add_neighbor(self, neighbor, weight):
-        self.connected_to[neighbor] = weight
+    def __eq__(self, other):
+        return isinstance(other, SolarSystem) and self.solar_map is other.solar_map and self.idx == other.idx
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return self.idx
 
     def get_connections(self):
-        return self.connected_to.keys()
+        gate_graph = self.solar_map.gate_graph
+        connections = set()
+        if self.idx < len(gate_graph):
+            connections.update(gate_graph.neighbors[gate_graph.offsets[self.idx]:gate_graph.offsets[self.idx + 1]])
+        connections.update(self.solar_map.overlay.wh_adjacency.get(self.idx, {}).keys())
+        return [SolarSystem(self.solar_map, x) for x in connections]
 
     def get_id(self):
-        return self.id
+        return self.solar_map.overlay.key(self.idx)
 
     def get_weight(self, neighbor):
-        return self.connected_to[neighbor]
+        overlay = self.solar_map.overlay
+        edge = overlay.wormhole_edge(self.idx, neighbor.idx)
+        if edge is not None:
+            return [
+                SolarMap.WORMHOLE,
+                [
+                    overlay.wh_sig[edge],
+                    overlay.wh_code[edge],
+                    overlay.wh_size[edge],
+                    overlay.wh_life[edge],
+                    overlay.wh_mass[edge],
+                    overlay.wh_time[edge],
+                ]
+            ]
+        if self.solar_map.gate_graph.has_gate(self.idx, neighbor.idx):
+            return [SolarMap.GATE, None]
+        raise KeyError(neighbor.get_id())
+
+    def get_origin(self, neighbor):
+        """
+        :return: name of the chain source of the wormhole to neighbor, None for gates
+        """
+        overlay = self.solar_map.overlay
+        edge = overlay.wormhole_edge(self.idx, neighbor.idx)
+        if edge is not None:
+            return overlay.wh_origin[edge]
+        return None
 
 
 class SolarMap:
     """
     Solar map handler
+
+    The gate layer is shared and frozen (built once by EveDb), only the wormhole overlay
+    belongs to this map.
     """
 
     GATE = 0
     WORMHOLE = 1
 
+    # security priorities up to this value are routed with a bucket queue
+    BUCKET_WEIGHT_LIMIT = 1000
+
     def __init__(self, eve_db):
         self.eve_db = eve_db
-        self.systems_list = {}
-        self.total_systems = 0
+        self.gate_graph = eve_db.gate_graph
+        self.overlay = WormholeOverlay(self.gate_graph)
+
+    @property
+    def total_systems(self):
+        return len(self.overlay)
 
     def add_system(self, key):
-        self.total_systems += 1
-        new_system = SolarSystem(key)
-        self.systems_list[key] = new_system
-        return new_system
+        return SolarSystem(self, self.overlay.add_node(key))
 
     def get_system(self, key):
-        if key in self.systems_list:
-            return self.systems_list[key]
+        idx = self.overlay.node(key)
+        if idx is not None:
+            return SolarSystem(self, idx)
         else:
             return None
 
     def get_all_systems(self):
-        return self.systems_list.keys()
+        return list(self.gate_graph.ids) + self.overlay.extra_ids
 
     def add_connection(
             self,
@@ -61,33 +109,179 @@ class SolarMap:
             con_type,
             con_info=None,
     ):
-        if source not in self.systems_list:
-            self.add_system(source)
-        if destination not in self.systems_list:
-            self.add_system(destination)
-
         if con_type == SolarMap.GATE:
-            self.systems_list[source].add_neighbor(self.systems_list[destination], [SolarMap.GATE, None])
-            self.systems_list[destination].add_neighbor(self.systems_list[source], [SolarMap.GATE, None])
+            u = self.overlay.node(source)
+            v = self.overlay.node(destination)
+            if u is None or v is None or not self.gate_graph.has_gate(u, v):
+                raise ValueError("Gate layer is frozen, cannot add gate {} - {}".format(source, destination))
         elif con_type == SolarMap.WORMHOLE:
-            [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, time_elapsed] = con_info
-            self.systems_list[source].add_neighbor(
-                self.systems_list[destination],
-                [SolarMap.WORMHOLE, [sig_source, code_source, wh_size, wh_life, wh_mass, time_elapsed]]
-            )
-            self.systems_list[destination].add_neighbor(
-                self.systems_list[source],
-                [SolarMap.WORMHOLE, [sig_dest, code_dest, wh_size, wh_life, wh_mass, time_elapsed]]
-            )
+            u = self.overlay.add_node(source)
+            v = self.overlay.add_node(destination)
+            [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, last_modified] = con_info
+            self.overlay.add_wormhole(u, v, sig_source, code_source, wh_size, wh_life, wh_mass, last_modified)
+            self.overlay.add_wormhole(v, u, sig_dest, code_dest, wh_size, wh_life, wh_mass, last_modified)
         else:
             # you shouldn't be here
             pass
 
+    def add_connections(self, connections, origin=None):
+        """
+        Add a batch of wormhole connections in one pass (same result as add_connection for each one)
+        :param connections: list of [source, destination, con_info]
+        :param origin: name of the chain source
+        """
+        add_node = self.overlay.add_node
+        edges = []
+        for source, destination, con_info in connections:
+            u = add_node(source)
+            v = add_node(destination)
+            [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, last_modified] = con_info
+            edges.append((u, v, sig_source, code_source, wh_size, wh_life, wh_mass, last_modified))
+            edges.append((v, u, sig_dest, code_dest, wh_size, wh_life, wh_mass, last_modified))
+        self.overlay.add_wormholes(edges, origin)
+
+    def get_connections(self):
+        """
+        Wormhole connections of the map, as added by add_connections
+        :return: dictionary origin -> list of [source, destination, con_info]
+        """
+        overlay = self.overlay
+        connections = {}
+        for edge in xrange(len(overlay.wh_source)):
+            u = overlay.wh_source[edge]
+            v = overlay.wh_dest[edge]
+            back = overlay.wormhole_edge(v, u)
+            if back is not None and back < edge:
+                # listed from the other side already
+                continue
+            connections.setdefault(overlay.wh_origin[edge], []).append([
+                overlay.key(u),
+                overlay.key(v),
+                [
+                    overlay.wh_sig[edge],
+                    overlay.wh_code[edge],
+                    overlay.wh_sig[back] if back is not None else "",
+                    overlay.wh_code[back] if back is not None else "",
+                    overlay.wh_size[edge],
+                    overlay.wh_life[edge],
+                    overlay.wh_mass[edge],
+                    overlay.wh_time[edge],
+                ],
+            ])
+        return connections
+
     def __contains__(self, item):
-        return item in self.systems_list
+        return self.overlay.node(item) is not None
 
     def __iter__(self):
-        return iter(self.systems_list.values())
+        return (SolarSystem(self, idx) for idx in xrange(len(self.overlay)))
+
+    def _closed_set(self, avoidance_list):
+        closed = bytearray(len(self.overlay))
+        for key in avoidance_list:
+            idx = self.overlay.node(key)
+            if idx is not None:
+                closed[idx] = 1
+        return closed
+
+    def _isolated(self, idx, wormholes):
+        """
+        True if the system has neither gates nor passable wormholes (e.g. unmapped w-space)
+        """
+        if idx < len(self.gate_graph) and self.gate_graph.offsets[idx] != self.gate_graph.offsets[idx + 1]:
+            return False
+        return idx not in wormholes
+
+    def _backtrack(self, parent, root, target):
+        path = [target]
+        while target != root:
+            target = parent[target]
+            path.append(target)
+        path.reverse()
+        return [self.overlay.key(x) for x in path]
+
+    def _gates(self, idx):
+        if idx < len(self.gate_graph):
+            return self.gate_graph.neighbors[self.gate_graph.offsets[idx]:self.gate_graph.offsets[idx + 1]]
+        return ()
+
+    def _bfs(self, root, target, visited, wormholes):
+        static_count = len(self.gate_graph)
+        offsets = self.gate_graph.offsets
+        neighbors = self.gate_graph.neighbors
+        parent = array.array('i', [-1]) * len(self.overlay)
+
+        # starting point
+        queue = collections.deque([root])
+        visited[root] = 1
+
+        while queue:
+            current = queue.popleft()
+            gates = neighbors[offsets[current]:offsets[current + 1]] if current < static_count else ()
+            for neighbor in gates:
+                if not visited[neighbor]:
+                    parent[neighbor] = current
+                    visited[neighbor] = 1
+                    queue.append(neighbor)
+            for neighbor in wormholes.get(current, ()):
+                if not visited[neighbor]:
+                    parent[neighbor] = current
+                    visited[neighbor] = 1
+                    queue.append(neighbor)
+
+            if parent[target] != -1:
+                # Found!
+                return self._backtrack(parent, root, target)
+
+        return []
+
+    def _bidirectional_bfs(self, root, target, closed, wormholes):
+        """
+        Search from both ends, always expanding a whole level of the smaller frontier.
+        Gates and wormholes are symmetric, so the backward search walks the same adjacency.
+        """
+        size = len(self.overlay)
+        depth = [array.array('i', [-1]) * size, array.array('i', [-1]) * size]
+        parent = [array.array('i', [-1]) * size, array.array('i', [-1]) * size]
+        frontier = [[root], [target]]
+        depth[0][root] = 0
+        depth[1][target] = 0
+        closed[root] = 0
+
+        while frontier[0] and frontier[1]:
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            own_depth = depth[side]
+            own_parent = parent[side]
+            other_depth = depth[1 - side]
+            meeting = None
+            meeting_length = 0
+            next_frontier = []
+
+            for current in frontier[side]:
+                for neighbor in itertools.chain(self._gates(current), wormholes.get(current, ())):
+                    if closed[neighbor] or own_depth[neighbor] != -1:
+                        continue
+                    own_depth[neighbor] = own_depth[current] + 1
+                    own_parent[neighbor] = current
+                    next_frontier.append(neighbor)
+                    if other_depth[neighbor] != -1:
+                        length = own_depth[neighbor] + other_depth[neighbor]
+                        if meeting is None or length < meeting_length:
+                            meeting = neighbor
+                            meeting_length = length
+
+            if meeting is not None:
+                # Found! (finishing the level guarantees the shortest meeting point)
+                path = self._backtrack(parent[0], root, meeting)
+                current = meeting
+                while current != target:
+                    current = parent[1][current]
+                    path.append(self.overlay.key(current))
+                return path
+
+            frontier[side] = next_frontier
+
+        return []
 
     def shortest_path(
             self,
@@ -97,67 +291,217 @@ class SolarMap:
             size_restriction,
             ignore_eol,
             ignore_masscrit,
-            age_threshold
+            age_threshold,
+            bidirectional=True
     ):
         path = []
-        size_restriction = set(size_restriction)
+        root = self.overlay.node(source)
+        target = self.overlay.node(destination)
 
-        if source in self.systems_list and destination in self.systems_list:
-            if source == destination:
+        if root is not None and target is not None:
+            if root == target:
                 path = [source]
             else:
-                queue = collections.deque()
-                visited = set([self.get_system(x) for x in avoidance_list])
-                parent = {}
-
-                # starting point
-                root = self.get_system(source)
-                queue.append(root)
-                visited.add(root)
-
-                while len(queue) > 0:
-                    current_sys = queue.popleft()
-
-                    if current_sys.get_id() == destination:
-                        # Found!
-                        path.append(destination)
-                        while True:
-                            parent_id = parent[current_sys].get_id()
-                            path.append(parent_id)
-
-                            if parent_id != source:
-                                current_sys = parent[current_sys]
-                            else:
-                                path.reverse()
-                                return path
-                    else:
-                        # Keep searching
-                        for neighbor in [x for x in current_sys.get_connections() if x not in visited]:
-                            # Connection check (gate or wormhole size)
-                            [con_type, con_info] = current_sys.get_weight(neighbor)
-                            if con_type == SolarMap.GATE:
-                                proceed = True
-                            elif con_type == SolarMap.WORMHOLE:
-                                proceed = True
-                                [_, _, wh_size, wh_life, wh_mass, time_elapsed] = con_info
-                                if wh_size not in size_restriction:
-                                    proceed = False
-                                elif ignore_eol and wh_life == 0:
-                                    proceed = False
-                                elif ignore_masscrit and wh_mass == 0:
-                                    proceed = False
-                                elif 0 < age_threshold < time_elapsed:
-                                    proceed = False
-                            else:
-                                proceed = False
-
-                            if proceed:
-                                parent[neighbor] = current_sys
-                                visited.add(neighbor)
-                                queue.append(neighbor)
+                wormholes = self.overlay.passable_wormholes(
+                    size_restriction,
+                    ignore_eol,
+                    ignore_masscrit,
+                    age_threshold
+                )
+                if self._isolated(root, wormholes) or self._isolated(target, wormholes):
+                    return path
+                visited = self._closed_set(avoidance_list)
+                if visited[target]:
+                    return path
+
+                if bidirectional:
+                    path = self._bidirectional_bfs(root, target, visited, wormholes)
+                else:
+                    path = self._bfs(root, target, visited, wormholes)
 
         return path
 
+    def _landmark_heuristic(self, root, target, wormholes, security_prio):
+        """
+        ALT heuristic scaled by the cheapest jump, so it stays admissible for any security_prio.
+        Landmarks only know gates, so the estimate is capped by the cheapest way of reaching the
+        target through the wormhole overlay: at least security_prio[3] for the last wormhole, plus
+        the gate jumps from the wormhole nearest (by landmark bound) to the target.
+        :return: function node -> estimated remaining cost, None if the estimate would not help
+        """
+        static_count = len(self.gate_graph)
+        scale = min(security_prio)
+        infinity = float('inf')
+        if target < static_count:
+            target_bound = self.eve_db.get_landmarks().lower_bound(root if root < static_count else target, target)
+        else:
+            target_bound = None
+
+        def gate_bound(node):
+            if node == target:
+                return 0
+            if node >= static_count or target_bound is None:
+                # no gates lead here
+                return infinity
+            jumps = target_bound(node)
+            if jumps == infinity:
+                # not connected to the target by gates (and 0 * infinity would not be a number)
+                return infinity
+            return scale * jumps
+
+        wormhole_bound = security_prio[3] + min([gate_bound(x) for x in wormholes] or [infinity])
+        if 2 * wormhole_bound < gate_bound(root):
+            # wormholes near the target flatten the estimate, plain Dijkstra is cheaper
+            return None
+
+        def heuristic(node):
+            if node == target:
+                return 0
+            return min(gate_bound(node), wormhole_bound)
+
+        return heuristic
+
+    def _weighted_search(self, root, target, visited, wormholes, security_prio, heuristic):
+        static_count = len(self.gate_graph)
+        offsets = self.gate_graph.offsets
+        neighbors = self.gate_graph.neighbors
+        security = self.gate_graph.security
+        wh_risk = security_prio[3]
+        infinity = float('inf')
+        distance = [infinity] * len(self.overlay)
+        parent = array.array('i', [-1]) * len(self.overlay)
+        if heuristic:
+            estimate = [None] * len(self.overlay)
+        else:
+            estimate = [0] * len(self.overlay)
+
+        # starting point
+        distance[root] = 0
+        priority_queue = [(0, root)]
+        visited[root] = 0
+
+        while priority_queue:
+            (_, current) = heapq.heappop(priority_queue)
+            if visited[current]:
+                # stale entry
+                continue
+            visited[current] = 1
+
+            if current == target:
+                # Found!
+                return self._backtrack(parent, root, target)
+
+            current_distance = distance[current]
+            gates = neighbors[offsets[current]:offsets[current + 1]] if current < static_count else ()
+            for neighbor in gates:
+                if not visited[neighbor]:
+                    new_distance = current_distance + security_prio[security[neighbor]]
+                    if new_distance < distance[neighbor]:
+                        remaining = estimate[neighbor]
+                        if remaining is None:
+                            remaining = estimate[neighbor] = heuristic(neighbor)
+                        if remaining < infinity:
+                            distance[neighbor] = new_distance
+                            parent[neighbor] = current
+                            heapq.heappush(priority_queue, (new_distance + remaining, neighbor))
+            for neighbor in wormholes.get(current, ()):
+                if not visited[neighbor]:
+                    new_distance = current_distance + wh_risk
+                    if new_distance < distance[neighbor]:
+                        remaining = estimate[neighbor]
+                        if remaining is None:
+                            remaining = estimate[neighbor] = heuristic(neighbor)
+                        if remaining < infinity:
+                            distance[neighbor] = new_distance
+                            parent[neighbor] = current
+                            heapq.heappush(priority_queue, (new_distance + remaining, neighbor))
+
+        return []
+
+    def _bucket_search(self, root, target, visited, wormholes, security_prio, heuristic):
+        """
+        Dial's algorithm: same search as _weighted_search, but with integer priorities the queue
+        holds buckets of systems keyed by (distance + estimate). Only priorities with queued systems
+        have a bucket (a small heap keeps them in order), so memory does not depend on how large the
+        priorities get. Each bucket is expanded in node order, i.e. system ID order. A system moved
+        to a lower bucket is expanded from there only, the entry left behind is skipped.
+        """
+        static_count = len(self.gate_graph)
+        offsets = self.gate_graph.offsets
+        neighbors = self.gate_graph.neighbors
+        security = self.gate_graph.security
+        wh_risk = security_prio[3]
+        infinity = float('inf')
+        distance = [infinity] * len(self.overlay)
+        parent = array.array('i', [-1]) * len(self.overlay)
+        queued = array.array('i', [-1]) * len(self.overlay)
+        if heuristic:
+            estimate = [None] * len(self.overlay)
+        else:
+            estimate = [0] * len(self.overlay)
+
+        # starting point
+        distance[root] = 0
+        buckets = {0: [root]}
+        priorities = [0]
+        queued[root] = 0
+        visited[root] = 0
+
+        while priorities:
+            priority = heapq.heappop(priorities)
+            # systems reaching this priority while the bucket is being expanded go to a fresh one
+            bucket = buckets.pop(priority)
+            bucket.sort()
+            for current in bucket:
+                if queued[current] != priority:
+                    # moved to a lower bucket, already expanded from there
+                    continue
+                queued[current] = -1
+                visited[current] = 1
+
+                if current == target:
+                    # Found!
+                    return self._backtrack(parent, root, target)
+
+                current_distance = distance[current]
+                gates = neighbors[offsets[current]:offsets[current + 1]] if current < static_count else ()
+                for neighbor in gates:
+                    if not visited[neighbor]:
+                        new_distance = current_distance + security_prio[security[neighbor]]
+                        if new_distance < distance[neighbor]:
+                            remaining = estimate[neighbor]
+                            if remaining is None:
+                                remaining = estimate[neighbor] = heuristic(neighbor)
+                            if remaining < infinity:
+                                distance[neighbor] = new_distance
+                                parent[neighbor] = current
+                                new_priority = new_distance + remaining
+                                if new_priority in buckets:
+                                    buckets[new_priority].append(neighbor)
+                                else:
+                                    buckets[new_priority] = [neighbor]
+                                    heapq.heappush(priorities, new_priority)
+                                queued[neighbor] = new_priority
+                for neighbor in wormholes.get(current, ()):
+                    if not visited[neighbor]:
+                        new_distance = current_distance + wh_risk
+                        if new_distance < distance[neighbor]:
+                            remaining = estimate[neighbor]
+                            if remaining is None:
+                                remaining = estimate[neighbor] = heuristic(neighbor)
+                            if remaining < infinity:
+                                distance[neighbor] = new_distance
+                                parent[neighbor] = current
+                                new_priority = new_distance + remaining
+                                if new_priority in buckets:
+                                    buckets[new_priority].append(neighbor)
+                                else:
+                                    buckets[new_priority] = [neighbor]
+                                    heapq.heappush(priorities, new_priority)
+                                queued[neighbor] = new_priority
+
+        return []
+
     def shortest_path_weighted(
             self,
             source,
@@ -167,70 +511,38 @@ class SolarMap:
             security_prio,
             ignore_eol,
             ignore_masscrit,
-            age_threshold
+            age_threshold,
+            use_landmarks=True
     ):
         path = []
-        size_restriction = set(size_restriction)
+        root = self.overlay.node(source)
+        target = self.overlay.node(destination)
 
-        if source in self.systems_list and destination in self.systems_list:
-            if source == destination:
+        if root is not None and target is not None:
+            if root == target:
                 path = [source]
             else:
-                priority_queue = []
-                visited = set([self.get_system(x) for x in avoidance_list])
-                distance = {}
-                parent = {}
-
-                # starting point
-                root = self.get_system(source)
-                distance[root] = 0
-                heapq.heappush(priority_queue, (distance[root], root))
-
-                while len(priority_queue) > 0:
-                    (_, current_sys) = heapq.heappop(priority_queue)
-                    visited.add(current_sys)
-
-                    if current_sys.get_id() == destination:
-                        # Found!
-                        path.append(destination)
-                        while True:
-                            parent_id = parent[current_sys].get_id()
-                            path.append(parent_id)
-
-                            if parent_id != source:
-                                current_sys = parent[current_sys]
-                            else:
-                                path.reverse()
-                                return path
-                    else:
-                        # Keep searching
-                        for neighbor in [x for x in current_sys.get_connections() if x not in visited]:
-                            # Connection check (gate or wormhole size)
-                            [con_type, con_info] = current_sys.get_weight(neighbor)
-                            if con_type == SolarMap.GATE:
-                                proceed = True
-                                risk = security_prio[self.eve_db.system_type(neighbor.get_id())]
-                            elif con_type == SolarMap.WORMHOLE:
-                                proceed = True
-                                risk = security_prio[3]
-                                [_, _, wh_size, wh_life, wh_mass, time_elapsed] = con_info
-                                if wh_size not in size_restriction:
-                                    proceed = False
-                                elif ignore_eol and wh_life == 0:
-                                    proceed = False
-                                elif ignore_masscrit and wh_mass == 0:
-                                    proceed = False
-                                elif 0 < age_threshold < time_elapsed:
-                                    proceed = False
-                            else:
-                                proceed = False
-
-                            if proceed:
-                                if neighbor not in distance:
-                                    distance[neighbor] = float('inf')
-                                if distance[neighbor] > distance[current_sys] + risk:
-                                    distance[neighbor] = distance[current_sys] + risk
-                                    heapq.heappush(priority_queue, (distance[neighbor], neighbor))
-                                    parent[neighbor] = current_sys
+                wormholes = self.overlay.passable_wormholes(
+                    size_restriction,
+                    ignore_eol,
+                    ignore_masscrit,
+                    age_threshold
+                )
+                if self._isolated(root, wormholes) or self._isolated(target, wormholes):
+                    return path
+                visited = self._closed_set(avoidance_list)
+                if visited[target]:
+                    return path
+
+                if use_landmarks:
+                    heuristic = self._landmark_heuristic(root, target, wormholes, security_prio)
+                else:
+                    heuristic = None
+                if all(
+                    isinstance(x, (int, long)) and 0 <= x <= SolarMap.BUCKET_WEIGHT_LIMIT for x in security_prio
+                ):
+                    path = self._bucket_search(root, target, visited, wormholes, security_prio, heuristic)
+                else:
+                    path = self._weighted_search(root, target, visited, wormholes, security_prio, heuristic)
 
         return path
@@ -0,0 +1,100 @@
+# taskexecutor.py
+
+import logging
+import Queue
+import threading
+
+
+class Future:
+    """
+    Result of a task submitted to a TaskExecutor
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        """
+        :return: return value of the task, None if not done within timeout seconds
+        :raises: exception raised by the task
+        """
+        self._done.wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        :param callback: called with the future once done (right away if already done)
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set(self, result, exception):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.error("Future callback failed", exc_info=True)
+
+
+class TaskExecutor:
+    """
+    Fixed number of worker threads running submitted tasks in order
+
+    Tasks are submitted under a key; submitting a key which is still queued or running returns
+    the future of that task instead of running it again.
+    """
+
+    def __init__(self, workers=1):
+        self._queue = Queue.Queue()
+        # key -> future of queued or running tasks
+        self._pending = {}
+        self._lock = threading.Lock()
+        for _ in xrange(workers):
+            worker = threading.Thread(target=self._work)
+            worker.setDaemon(True)
+            worker.start()
+
+    def submit(self, key, fn, *args):
+        """
+        :return: Future of the task
+        """
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, future, fn, args))
+            return future
+
+    def _work(self):
+        while True:
+            key, future, fn, args = self._queue.get()
+            result = exception = None
+            try:
+                result = fn(*args)
+            except Exception as e:
+                logging.error("Task {} failed".format(key), exc_info=True)
+                exception = e
+            with self._lock:
+                self._pending.pop(key, None)
+            future._set(result, exception)
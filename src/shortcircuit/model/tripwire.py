@@ -1,32 +1,45 @@
 # tripwire.py
 
-import json
 import requests
+import time
 import urlparse
 import logging
-from datetime import datetime
-from solarmap import SolarMap
+from chainsource import ChainSource
+from httpclient import http_client
+from timestamp import parse_timestamp
 
 
-class Tripwire:
+class Tripwire(ChainSource):
     """
     Tripwire handler
     """
+    NAME = "Tripwire"
+    DEADLINE = 25
     USER_AGENT = "Short Circuit v.0.1.4-beta"
+    TIMEOUT = 10
 
     def __init__(self, eve_db, username, password, url):
-        self.eve_db = eve_db
+        ChainSource.__init__(self, eve_db)
         self.username = username
         self.password = password
         self.url = url
-        self.session_requests = self.login()
-
-    def login(self):
-        response = None
+        # one session for the lifetime of the client keeps the login cookie, connections come from the shared pool
+        self.session_requests = http_client.new_session()
+        self.logged_in = False
+        # incremental sync state: last sync point reported by the server and the signatures known so far
+        self.sync_point = None
+        self.signatures = {}
+        # cleared once the server turns out not to support "sync" requests
+        self.sync_supported = True
+
+    def login(self, deadline=None):
+        """
+        :param deadline: time the login has to be done by (seconds since the epoch)
+        """
+        self.logged_in = False
+        self.session_requests.cookies.clear()
 
         login_url = urlparse.urljoin(self.url, "login.php")
-        session_requests = requests.session()
-
         payload = {
             "username": self.username,
             "password": self.password
@@ -37,118 +50,155 @@ class Tripwire:
         }
 
         try:
-            result = session_requests.post(
+            result = http_client.post(
                 login_url,
                 data=payload,
-                headers=headers
+                headers=headers,
+                timeout=Tripwire.TIMEOUT,
+                deadline=deadline,
+                session=self.session_requests
             )
         except requests.exceptions.RequestException:
             logging.warning("Unable to connect to Tripwire")
         else:
             if result.status_code == 200:
-                response = session_requests
+                self.logged_in = True
 
-        return response
+        return self.logged_in
 
-    def get_chain(self):
+    def _refresh(self, deadline=None):
+        """
+        :return: chain, None on error or False if the session is not authenticated (anymore)
+        """
         response = None
 
-        if self.session_requests:
-            refresh_url = urlparse.urljoin(self.url, "refresh.php")
+        refresh_url = urlparse.urljoin(self.url, "refresh.php")
+        incremental = self.sync_point and self.sync_supported
+        if incremental:
+            payload = {
+                "mode": "sync",
+                "since": self.sync_point
+            }
+        else:
             payload = {
                 "mode": "init",
                 "systemID": "30000142"
             }
-            headers = {
-                "Referer": refresh_url,
-                "User-Agent": Tripwire.USER_AGENT,
-            }
-
-            try:
-                result = self.session_requests.get(
-                    refresh_url,
-                    params=payload,
-                    headers=headers
-                )
-            except requests.exceptions.RequestException as e:
-                logging.error(e, exc_info=True)
-            else:
-                if result.status_code == 200:
-                    if is_json(result.text):
-                        response = result.json()
-
-        return response
+        headers = {
+            "Referer": refresh_url,
+            "User-Agent": Tripwire.USER_AGENT,
+        }
 
-    def augment_map(self, solar_map):
-        connections = -1  # not logged in, yet
-        chain = self.get_chain()
-
-        if chain:
-            # we get some sort of response so at least we're logged in
-            connections = 0
-
-            # let's see how many wormhole signatures exist (if any...)
-            for sig in chain["chain"]["map"]:
-                if sig["type"] != "GATE":
-                    connections += 1
-
-                    # Retrieve signature meta data
-                    source = convert_to_int(sig["systemID"])
-                    dest = convert_to_int(sig["connectionID"])
-                    sig_source = sig["signatureID"]
-                    sig_dest = sig["sig2ID"]
-                    code_source = sig["type"]
-                    code_dest = sig["sig2Type"]
-                    if sig["life"] == "Stable":
-                        wh_life = 1
-                    else:
-                        wh_life = 0
-                    if sig["mass"] == "Stable":
-                        wh_mass = 2
-                    elif sig["mass"] == "Destab":
-                        wh_mass = 1
-                    else:
-                        wh_mass = 0
-
-                    # Compute time elapsed from this moment to when the signature was updated
-                    last_modified = datetime.strptime(sig["time"], "%Y-%m-%d %H:%M:%S")
-                    delta = datetime.utcnow() - last_modified
-                    time_elapsed = round(delta.total_seconds() / 3600.0, 1)
-
-                    if source != 0 and dest != 0:
-                        # Determine wormhole size
-                        size_result1 = self.eve_db.get_whsize_by_code(code_source)
-                        size_result2 = self.eve_db.get_whsize_by_code(code_dest)
-                        if size_result1 in [0, 1, 2, 3]:
-                            wh_size = size_result1
-                        elif size_result2 in [0, 1, 2, 3]:
-                            wh_size = size_result2
+        try:
+            result = http_client.get(
+                refresh_url,
+                params=payload,
+                headers=headers,
+                timeout=Tripwire.TIMEOUT,
+                deadline=deadline,
+                session=self.session_requests
+            )
+        except requests.exceptions.RequestException as e:
+            logging.error(e, exc_info=True)
+        else:
+            if result.status_code in [401, 403]:
+                response = False
+            elif result.status_code == 200:
+                try:
+                    response = result.json()
+                except ValueError:
+                    # login page instead of chain data
+                    response = False
+                else:
+                    if "chain" not in response:
+                        if incremental and "deleted" not in response:
+                            # the session is fine, the server just does not know "sync" requests
+                            logging.info("Tripwire server does not support incremental sync")
+                            self.sync_supported = False
+                            self.sync_point = None
+                            return self._refresh(deadline)
+                        elif incremental:
+                            # only deletions
+                            response["chain"] = {"map": []}
                         else:
-                            # Wormhole codes are unknown => determine size based on class of wormholes
-                            wh_size = self.eve_db.get_whsize_by_system(source, dest)
-
-                        # Add wormhole conection to solar system
-                        solar_map.add_connection(
-                            source,
-                            dest,
-                            SolarMap.WORMHOLE,
-                            [sig_source, code_source, sig_dest, code_dest, wh_size, wh_life, wh_mass, time_elapsed],
-                        )
-
-        return connections
+                            response = False
 
+        return response
 
-def is_json(response):
-    """
-    Check if the response parameter is a valid JSON string
-    :param response:
-    :return:
-    """
-    try:
-        json.loads(response)
-    except ValueError:
-        return False
-    return True
+    def get_chain(self, deadline=None):
+        """
+        Log in only when needed: first use or after the session was rejected
+        :param deadline: time all requests (logins included) have to be done by (seconds since the epoch)
+        """
+        if not self.logged_in and not self.login(deadline):
+            return None
+
+        response = self._refresh(deadline)
+        if response is False and self.login(deadline):
+            response = self._refresh(deadline)
+
+        return response or None
+
+    def _parse_signature(self, sig):
+        """
+        :return: connection record, None if not a wormhole connection
+        """
+        code_source = sig["type"]
+        if code_source == "GATE":
+            return None
+        source = convert_to_int(sig["systemID"])
+        dest = convert_to_int(sig["connectionID"])
+        if source == 0 or dest == 0:
+            return None
+
+        return self.connection(
+            source,
+            dest,
+            sig["signatureID"],
+            code_source,
+            sig["sig2ID"],
+            sig["sig2Type"],
+            ChainSource.WH_LIFE.get(sig["life"].lower(), 0),
+            ChainSource.WH_MASS.get(sig["mass"].lower(), 0),
+            parse_timestamp(sig["time"])
+        )
+
+    def sync(self, deadline=None):
+        """
+        Bring the known signatures up to date. Servers supporting incremental sync answer a
+        "sync" request with the changed signatures and the IDs of the deleted ones; any other
+        answer is a full chain which replaces the known signatures. Servers answering "sync"
+        requests without a chain are asked for the full chain from then on.
+        :return: True if successful
+        """
+        chain = self.get_chain(deadline)
+        if not chain:
+            self.sync_point = None
+            return False
+
+        if not self.sync_point or "deleted" not in chain:
+            self.signatures = {}
+        for sig in chain["chain"]["map"]:
+            key = sig.get("id") or (sig["systemID"], sig["signatureID"])
+            connection = self._parse_signature(sig)
+            if connection:
+                self.signatures[key] = connection
+            else:
+                self.signatures.pop(key, None)
+        for key in chain.get("deleted", []):
+            self.signatures.pop(key, None)
+        self.sync_point = chain.get("sync")
+
+        return True
+
+    def get_connections(self):
+        """
+        :return: list of connection records (see ChainSource), None if not logged in
+        """
+        # give up before the refresh stops waiting for us
+        if not self.sync(time.time() + Tripwire.DEADLINE):
+            return None
+        return self.signatures.values()
 
 
 def convert_to_int(s):
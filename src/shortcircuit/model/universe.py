@@ -0,0 +1,187 @@
+# universe.py
+
+import array
+import logging
+import mmap
+import os
+import struct
+import sys
+from evedb import DATABASE_DIR
+from graph import GateGraph
+
+
+class SystemTable:
+    """
+    Read-only system_id -> [name, class, security] mapping over the memory-mapped system records
+    (drop-in replacement for the system_desc dict built from system_description.csv)
+    """
+
+    def __init__(self, data, ids, index, records_offset, names_offset, class_names):
+        self._data = data
+        self._ids = ids
+        self._index = index
+        self._records_offset = records_offset
+        self._names_offset = names_offset
+        self._class_names = class_names
+
+    def _record(self, idx):
+        (_, name_offset, name_length, class_idx, _, security) = Universe.RECORD.unpack_from(
+            self._data,
+            self._records_offset + idx * Universe.RECORD.size
+        )
+        name_offset += self._names_offset
+        return [self._data[name_offset:name_offset + name_length], self._class_names[class_idx], security / 100.0]
+
+    def __getitem__(self, key):
+        return self._record(self._index[key])
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def get(self, key, default=None):
+        idx = self._index.get(key)
+        if idx is None:
+            return default
+        return self._record(idx)
+
+    def keys(self):
+        return list(self._ids)
+
+    def values(self):
+        return [self._record(idx) for idx in xrange(len(self._ids))]
+
+    def iteritems(self):
+        for idx, key in enumerate(self._ids):
+            yield key, self._record(idx)
+
+    def items(self):
+        return list(self.iteritems())
+
+
+class Universe:
+    """
+    Binary universe file (generated by db_create.py)
+
+    Layout (little-endian):
+        header
+        class name table: one length-prefixed string per class
+        system records: fixed-width, one per system, sorted by system ID
+        name table: system names, concatenated
+        gate CSR offsets (int32, systems + 1) and neighbors (int32)
+    """
+
+    FILE = os.path.join(DATABASE_DIR, "universe.bin")
+    MAGIC = "SCUV"
+    VERSION = 1
+    # magic, version, systems, gate neighbors, classes, name table size
+    HEADER = struct.Struct("<4sHIIHI")
+    # system ID, name offset, name length, class index, security type, security * 100
+    RECORD = struct.Struct("<iIHBbh")
+
+    def __init__(self, system_desc, gate_graph):
+        self.system_desc = system_desc
+        self.gate_graph = gate_graph
+
+    @staticmethod
+    def write(path, eve_db):
+        """
+        :param path: output file
+        :param eve_db: EveDb built from the CSV files
+        """
+        gate_graph = eve_db.gate_graph
+        class_names = sorted(set(eve_db.system_desc[x][1] for x in gate_graph.ids))
+        class_index = {name: idx for idx, name in enumerate(class_names)}
+
+        records = []
+        names = []
+        name_offset = 0
+        for idx, system_id in enumerate(gate_graph.ids):
+            [name, sys_class, security] = eve_db.system_desc[system_id]
+            records.append(Universe.RECORD.pack(
+                system_id,
+                name_offset,
+                len(name),
+                class_index[sys_class],
+                gate_graph.security[idx],
+                int(round(security * 100))
+            ))
+            names.append(name)
+            name_offset += len(name)
+
+        offsets = array.array('i', gate_graph.offsets)
+        neighbors = array.array('i', gate_graph.neighbors)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            neighbors.byteswap()
+
+        with open(path, "wb") as f:
+            f.write(Universe.HEADER.pack(
+                Universe.MAGIC,
+                Universe.VERSION,
+                len(gate_graph),
+                len(gate_graph.neighbors),
+                len(class_names),
+                name_offset
+            ))
+            for name in class_names:
+                f.write(struct.pack("<B", len(name)) + name)
+            f.write("".join(records))
+            f.write("".join(names))
+            f.write(offsets.tostring())
+            f.write(neighbors.tostring())
+
+    @staticmethod
+    def load(path=FILE):
+        """
+        :return: Universe backed by the memory-mapped file, or None if missing or not readable
+        """
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None
+
+        try:
+            (magic, version, total, total_neighbors, total_classes, names_size) = Universe.HEADER.unpack_from(data)
+        except struct.error:
+            return None
+        if magic != Universe.MAGIC or version != Universe.VERSION:
+            logging.warning("Unsupported universe file '{}'".format(path))
+            return None
+
+        offset = Universe.HEADER.size
+        class_names = []
+        for _ in xrange(total_classes):
+            length = ord(data[offset])
+            class_names.append(data[offset + 1:offset + 1 + length])
+            offset += 1 + length
+
+        records_offset = offset
+        names_offset = records_offset + total * Universe.RECORD.size
+        offset = names_offset + names_size
+
+        # fixed-width columns are copied out of the mapping as whole arrays
+        ids = array.array('i')
+        security = array.array('b')
+        records = struct.Struct("<" + Universe.RECORD.format[1:] * total).unpack_from(data, records_offset)
+        ids.fromlist(list(records[0::6]))
+        security.fromlist(list(records[4::6]))
+
+        offsets = array.array('i')
+        offsets.fromstring(data[offset:offset + 4 * (total + 1)])
+        offset += 4 * (total + 1)
+        neighbors = array.array('i')
+        neighbors.fromstring(data[offset:offset + 4 * total_neighbors])
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            neighbors.byteswap()
+
+        gate_graph = GateGraph(ids, offsets, neighbors, security)
+        system_desc = SystemTable(data, ids, gate_graph.index, records_offset, names_offset, class_names)
+        return Universe(system_desc, gate_graph)
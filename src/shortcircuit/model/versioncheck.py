@@ -2,7 +2,9 @@
 
 import requests
 import logging
+import time
 from PySide import QtCore
+from httpclient import http_client
 
 
 class VersionCheck(QtCore.QObject):
@@ -10,6 +12,10 @@ class VersionCheck(QtCore.QObject):
     Version Check on Github releases
     """
 
+    TIMEOUT = 3.1
+    # seconds the check may take, retries included
+    DEADLINE = 5
+
     finished = QtCore.Signal(str)
 
     def __init__(self, parent=None):
@@ -19,9 +25,10 @@ class VersionCheck(QtCore.QObject):
         version = None
 
         try:
-            result = requests.get(
-                url="https://api.github.com/repos/farshield/shortcircuit/releases/latest",
-                timeout=3.1
+            result = http_client.get(
+                "https://api.github.com/repos/farshield/shortcircuit/releases/latest",
+                timeout=VersionCheck.TIMEOUT,
+                deadline=time.time() + VersionCheck.DEADLINE
             )
         except requests.exceptions.RequestException:
             logging.warning("Unable to get latest version tag")
@@ -136,7 +136,7 @@ class Ui_MainWindow(object):
         self.pushButton_trip_get.setIcon(icon2)
         self.pushButton_trip_get.setIconSize(QtCore.QSize(24, 24))
         self.pushButton_trip_get.setObjectName("pushButton_trip_get")
-        self.gridLayout_4.addWidget(self.pushButton_trip_get, 1, 0, 1, 1)
+        self.gridLayout_4.addWidget(self.pushButton_trip_get, 2, 0, 1, 1)
         self.pushButton_eve_login = QtGui.QPushButton(self.groupBox__options)
         self.pushButton_eve_login.setEnabled(True)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Fixed)
@@ -162,7 +162,7 @@ class Ui_MainWindow(object):
         icon4.addPixmap(QtGui.QPixmap(":/images/config_icon.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
         self.pushButton_trip_config.setIcon(icon4)
         self.pushButton_trip_config.setObjectName("pushButton_trip_config")
-        self.gridLayout_4.addWidget(self.pushButton_trip_config, 1, 1, 1, 1)
+        self.gridLayout_4.addWidget(self.pushButton_trip_config, 2, 1, 1, 1)
         self.pushButton_crest_config = QtGui.QPushButton(self.groupBox__options)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Minimum)
         sizePolicy.setHorizontalStretch(0)
@@ -172,6 +172,9 @@ class Ui_MainWindow(object):
         self.pushButton_crest_config.setIcon(icon4)
         self.pushButton_crest_config.setObjectName("pushButton_crest_config")
         self.gridLayout_4.addWidget(self.pushButton_crest_config, 0, 1, 1, 1)
+        self.checkBox_location_tracking = QtGui.QCheckBox(self.groupBox__options)
+        self.checkBox_location_tracking.setObjectName("checkBox_location_tracking")
+        self.gridLayout_4.addWidget(self.checkBox_location_tracking, 1, 0, 1, 2)
         self.verticalLayout_3.addLayout(self.gridLayout_4)
         self.label_trip_status = QtGui.QLabel(self.groupBox__options)
         self.label_trip_status.setAlignment(QtCore.Qt.AlignCenter)
@@ -431,6 +434,8 @@ class Ui_MainWindow(object):
         self.pushButton_eve_login.setText(QtGui.QApplication.translate("MainWindow", "Log in with EvE", None, QtGui.QApplication.UnicodeUTF8))
         self.pushButton_trip_config.setText(QtGui.QApplication.translate("MainWindow", "Tripwire", None, QtGui.QApplication.UnicodeUTF8))
         self.pushButton_crest_config.setText(QtGui.QApplication.translate("MainWindow", "CREST", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBox_location_tracking.setToolTip(QtGui.QApplication.translate("MainWindow", "Keep the source system on the character location while logged in", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBox_location_tracking.setText(QtGui.QApplication.translate("MainWindow", "Track character location", None, QtGui.QApplication.UnicodeUTF8))
         self.label_trip_status.setText(QtGui.QApplication.translate("MainWindow", "Not connected to Tripwire, yet", None, QtGui.QApplication.UnicodeUTF8))
         self.label_evescout_status.setText(QtGui.QApplication.translate("MainWindow", "Eve-Scout", None, QtGui.QApplication.UnicodeUTF8))
         self.groupBox_restrictions.setTitle(QtGui.QApplication.translate("MainWindow", "Restrictions", None, QtGui.QApplication.UnicodeUTF8))
@@ -12,14 +12,14 @@ from PySide import QtCore, QtGui
 class Ui_TripwireDialog(object):
     def setupUi(self, TripwireDialog):
         TripwireDialog.setObjectName("TripwireDialog")
-        TripwireDialog.resize(400, 255)
+        TripwireDialog.resize(400, 285)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Fixed, QtGui.QSizePolicy.Fixed)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(TripwireDialog.sizePolicy().hasHeightForWidth())
         TripwireDialog.setSizePolicy(sizePolicy)
-        TripwireDialog.setMinimumSize(QtCore.QSize(400, 255))
-        TripwireDialog.setMaximumSize(QtCore.QSize(400, 255))
+        TripwireDialog.setMinimumSize(QtCore.QSize(400, 285))
+        TripwireDialog.setMaximumSize(QtCore.QSize(400, 285))
         font = QtGui.QFont()
         font.setFamily("Arial")
         TripwireDialog.setFont(font)
@@ -88,6 +88,15 @@ class Ui_TripwireDialog(object):
         self.label_6.setObjectName("label_6")
         self.horizontalLayout.addWidget(self.label_6)
         self.gridLayout.addLayout(self.horizontalLayout, 5, 1, 1, 1)
+        self.label_auto_refresh = QtGui.QLabel(TripwireDialog)
+        self.label_auto_refresh.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.label_auto_refresh.setObjectName("label_auto_refresh")
+        self.gridLayout.addWidget(self.label_auto_refresh, 8, 0, 1, 1)
+        self.spinBox_auto_refresh = QtGui.QSpinBox(TripwireDialog)
+        self.spinBox_auto_refresh.setMaximum(3600)
+        self.spinBox_auto_refresh.setSingleStep(30)
+        self.spinBox_auto_refresh.setObjectName("spinBox_auto_refresh")
+        self.gridLayout.addWidget(self.spinBox_auto_refresh, 8, 1, 1, 1)
 
         self.retranslateUi(TripwireDialog)
         QtCore.QObject.connect(self.buttonBox, QtCore.SIGNAL("accepted()"), TripwireDialog.accept)
@@ -102,5 +111,9 @@ class Ui_TripwireDialog(object):
         self.label_5.setText(QtGui.QApplication.translate("TripwireDialog", "<html><head/><body><p><a href=\"https://tripwire.eve-apps.com/\"><span style=\" text-decoration: underline; color:#0000ff;\">Don\'t have a Tripwire account, yet?</span></a></p></body></html>", None, QtGui.QApplication.UnicodeUTF8))
         self.checkBox_evescout.setText(QtGui.QApplication.translate("TripwireDialog", "Enable Eve-Scout", None, QtGui.QApplication.UnicodeUTF8))
         self.label_6.setText(QtGui.QApplication.translate("TripwireDialog", "<html><head/><body><p><a href=\"https://github.com/farshield/shortcircuit/blob/master/README.md#eve-scout\"><span style=\" text-decoration: underline; color:#0000ff;\">[Should I enable this?]</span></a></p></body></html>", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_auto_refresh.setText(QtGui.QApplication.translate("TripwireDialog", "Auto-refresh:", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox_auto_refresh.setToolTip(QtGui.QApplication.translate("TripwireDialog", "Seconds between automatic chain refreshes", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox_auto_refresh.setSpecialValueText(QtGui.QApplication.translate("TripwireDialog", "Disabled", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox_auto_refresh.setSuffix(QtGui.QApplication.translate("TripwireDialog", " s", None, QtGui.QApplication.UnicodeUTF8))
 
 import resources_rc
@@ -0,0 +1,175 @@
+# tripwire_server.py
+
+import BaseHTTPServer
+import Cookie
+import json
+import random
+import sys
+import threading
+import urlparse
+import uuid
+from datetime import datetime
+from SocketServer import ThreadingMixIn
+
+
+class Chain:
+    """
+    Random wormhole chain which keeps changing (signatures are added, updated and deleted)
+    """
+
+    CODES = ["A641", "B274", "C247", "D382", "E175", "H296", "K162", "N110", "O477", "U210", "X877", "????"]
+    LIFE = ["Stable", "Critical"]
+    MASS = ["Stable", "Destab", "Critical"]
+
+    def __init__(self, signatures, churn):
+        self.churn = churn
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.next_id = 1
+        # id -> [sequence of last change, signature]
+        self.signatures = {}
+        # id -> sequence of deletion
+        self.deleted = {}
+        for _ in xrange(signatures):
+            self._add()
+
+    def _touch(self, sig):
+        self.sequence += 1
+        sig["time"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.signatures[sig["id"]] = [self.sequence, sig]
+
+    @staticmethod
+    def _sig_name():
+        return "".join(random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in xrange(3))
+
+    def _add(self):
+        sig_id = str(self.next_id)
+        self.next_id += 1
+        self._touch({
+            "id": sig_id,
+            "signatureID": Chain._sig_name(),
+            "systemID": str(random.randint(31000001, 31002500)),
+            "connectionID": str(random.choice([random.randint(30000001, 30005000), random.randint(31000001, 31002500)])),
+            "sig2ID": Chain._sig_name(),
+            "type": random.choice(Chain.CODES),
+            "sig2Type": "K162",
+            "life": random.choice(Chain.LIFE),
+            "mass": random.choice(Chain.MASS),
+        })
+
+    def _update(self):
+        sig = self.signatures[random.choice(self.signatures.keys())][1]
+        sig["life"] = random.choice(Chain.LIFE)
+        sig["mass"] = random.choice(Chain.MASS)
+        self._touch(sig)
+
+    def _delete(self):
+        sig_id = random.choice(self.signatures.keys())
+        del self.signatures[sig_id]
+        self.sequence += 1
+        self.deleted[sig_id] = self.sequence
+
+    def step(self):
+        with self.lock:
+            for _ in xrange(self.churn):
+                action = random.choice([self._add, self._update, self._delete])
+                if action != self._add and not self.signatures:
+                    action = self._add
+                action()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "chain": {"map": [sig for _, sig in self.signatures.itervalues()]},
+                "sync": str(self.sequence),
+            }
+
+    def changes(self, since):
+        with self.lock:
+            return {
+                "chain": {"map": [sig for sequence, sig in self.signatures.itervalues() if sequence > since]},
+                "deleted": [sig_id for sig_id, sequence in self.deleted.iteritems() if sequence > since],
+                "sync": str(self.sequence),
+            }
+
+
+class TripwireHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Minimal Tripwire stand-in: login.php and refresh.php (modes "init" and "sync")
+    """
+
+    protocol_version = "HTTP/1.1"
+    sessions = set()
+    chain = None
+
+    def _send(self, code, body, content_type="application/json", cookie=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _session(self):
+        cookie = Cookie.SimpleCookie(self.headers.getheader("Cookie", ""))
+        if "PHPSESSID" in cookie and cookie["PHPSESSID"].value in TripwireHandler.sessions:
+            return cookie["PHPSESSID"].value
+        return None
+
+    def do_POST(self):
+        url = urlparse.urlparse(self.path)
+        self.rfile.read(int(self.headers.getheader("Content-Length", 0)))
+        if url.path.endswith("/login.php"):
+            session = uuid.uuid4().hex
+            TripwireHandler.sessions.add(session)
+            self._send(200, "", "text/html", "PHPSESSID={}; Path=/".format(session))
+        else:
+            self._send(404, "", "text/html")
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if not url.path.endswith("/refresh.php"):
+            self._send(404, "", "text/html")
+        elif not self._session():
+            self._send(200, "<html>login</html>", "text/html")
+        else:
+            params = urlparse.parse_qs(url.query)
+            TripwireHandler.chain.step()
+            if params.get("mode") == ["sync"] and params.get("since", [""])[0].isdigit():
+                response = TripwireHandler.chain.changes(int(params["since"][0]))
+            else:
+                response = TripwireHandler.chain.snapshot()
+            self._send(200, json.dumps(response))
+
+    def log_message(self, message_format, *args):
+        sys.stderr.write("{} {}\n".format(self.address_string(), message_format % args))
+
+
+class ThreadingHTTPServer(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def main():
+    """
+    Local stand-in for a Tripwire server (for testing the incremental chain sync)
+    Usage: python tripwire_server.py [port] [signatures] [changes per refresh]
+    Use "http://127.0.0.1:<port>/" as Tripwire URL, any user/password is accepted
+    :return:
+    """
+    args = sys.argv[1:]
+    port = int(args[0]) if len(args) > 0 else 8000
+    signatures = int(args[1]) if len(args) > 1 else 300
+    churn = int(args[2]) if len(args) > 2 else 5
+
+    TripwireHandler.chain = Chain(signatures, churn)
+    server = ThreadingHTTPServer(("127.0.0.1", port), TripwireHandler)
+    print "Tripwire stand-in listening on http://127.0.0.1:{}/".format(port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()